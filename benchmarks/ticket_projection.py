@@ -0,0 +1,128 @@
+"""
+Payload size and latency of the ticket search query with select=* versus the
+projected TICKET_SELECT columns from enrichment-mcp.py.
+
+Seeds a throwaway tenant with tickets carrying large artifacts_and_assets and
+related_alerts, runs the same users-containment search both ways, prints the
+results and deletes the seeded rows. It writes to the tickets table, so the target must
+be given explicitly (--url/--key or SUPABASE_URL/SUPABASE_KEY), normally a local Supabase
+stack (`supabase start`); the hosted project enrichment-mcp.py defaults to is refused.
+
+    python benchmarks/ticket_projection.py --url http://127.0.0.1:54321 --key <anon key> --tickets 200 --artifacts 500 --runs 20
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import statistics
+import importlib.util
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+import httpx
+
+ENRICHMENT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "enrichment-mcp.py")
+
+
+def load_enrichment():
+    """Import enrichment-mcp.py (hyphenated, so not importable by name) to share its config and projection."""
+    # enrichment-mcp.py imports normalization.py from the repository root
+    sys.path.insert(0, os.path.dirname(ENRICHMENT_PATH))
+    spec = importlib.util.spec_from_file_location("enrichment_mcp", ENRICHMENT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_ticket(tenant_id, index, username, artifact_count):
+    """One ticket whose JSONB columns are roughly as heavy as a busy production alert."""
+    return {
+        "tenant_id": tenant_id,
+        "occurred_at": datetime.now(timezone.utc).isoformat(),
+        "name": f"Benchmark alert {index}",
+        "severity": "high",
+        "status": "open",
+        "artifacts_and_assets": {
+            "users": [{"value": username}],
+            "assets": [{"value": f"host-{i}.corp.example", "os": "windows"} for i in range(artifact_count // 10 + 1)],
+            "artifacts": {
+                "ip_addresses": [{"value": f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}"} for i in range(artifact_count)],
+                "domains": [{"value": f"d{i}.example.com"} for i in range(artifact_count)],
+                "hashes": [{"value": uuid.uuid4().hex * 2} for _ in range(artifact_count)],
+                "urls": [{"value": f"https://d{i}.example.com/path?q={i}"} for i in range(artifact_count)],
+            },
+        },
+        "related_alerts": {
+            "users": {username: [{"id": i, "time": "", "name": f"Benchmark alert {i}"} for i in range(artifact_count)]},
+        },
+    }
+
+
+def measure(http, url, headers, params, runs):
+    """Run the query `runs` times; return (payload bytes, row count, latencies in ms)."""
+    latencies = []
+    payload_bytes = rows = 0
+    for _ in range(runs):
+        started = time.perf_counter()
+        response = http.get(url, headers=headers, params=params)
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+        payload_bytes = len(response.content)
+        rows = len(response.json())
+    return payload_bytes, rows, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tickets", type=int, default=200, help="tickets seeded for the benchmark tenant")
+    parser.add_argument("--artifacts", type=int, default=500, help="entries per artifact list in each ticket")
+    parser.add_argument("--runs", type=int, default=20, help="timed runs per variant")
+    parser.add_argument("--url", default=os.environ.get("SUPABASE_URL"), help="Supabase URL to seed and query (default: $SUPABASE_URL)")
+    parser.add_argument("--key", default=os.environ.get("SUPABASE_KEY"), help="API key for --url (default: $SUPABASE_KEY)")
+    args = parser.parse_args()
+    if not args.url or not args.key:
+        parser.error("--url and --key (or SUPABASE_URL and SUPABASE_KEY) are required; this seeds and deletes tickets")
+
+    enrichment = load_enrichment()
+    if urlparse(args.url).hostname == urlparse(enrichment.DEFAULT_SUPABASE_URL).hostname:
+        parser.error(f"refusing to seed and delete tickets in the hosted project {args.url}")
+    url = f"{args.url.rstrip('/')}/rest/v1/tickets"
+    headers = {"apikey": args.key, "Authorization": f"Bearer {args.key}"}
+    tenant_id = f"bench-{uuid.uuid4().hex[:8]}"
+    username = "bench.user"
+
+    with httpx.Client(timeout=120) as http:
+        print(f"Seeding {args.tickets} tickets ({args.artifacts} artifacts each) for tenant {tenant_id}")
+        try:
+            # Inside the try so a seeding failure still deletes the batches already written
+            for start in range(0, args.tickets, 50):
+                batch = [build_ticket(tenant_id, i, username, args.artifacts) for i in range(start, min(start + 50, args.tickets))]
+                http.post(url, headers={**headers, "Prefer": "return=minimal"}, json=batch).raise_for_status()
+
+            search = {
+                "artifacts_and_assets->users": "cs." + json.dumps([{"value": username}]),
+                "tenant_id": f"eq.{tenant_id}",
+            }
+            # Warm up the connection and Postgres caches before timing either variant
+            http.get(url, headers=headers, params={"select": "id", **search})
+
+            results = {}
+            for label, select in (("select=*", "*"), ("projected", enrichment.TICKET_SELECT)):
+                results[label] = measure(http, url, headers, {"select": select, **search}, args.runs)
+
+            print(f"{'variant':<12}{'rows':>6}{'payload bytes':>16}{'p50 ms':>10}{'p95 ms':>10}")
+            for label, (payload_bytes, rows, latencies) in results.items():
+                p95 = sorted(latencies)[max(0, int(len(latencies) * 0.95) - 1)]
+                print(f"{label:<12}{rows:>6}{payload_bytes:>16}{statistics.median(latencies):>10.1f}{p95:>10.1f}")
+            full_bytes, projected_bytes = results["select=*"][0], results["projected"][0]
+            if projected_bytes:
+                print(f"Payload reduction: {full_bytes / projected_bytes:.1f}x")
+        finally:
+            http.delete(url, headers=headers, params={"tenant_id": f"eq.{tenant_id}"}).raise_for_status()
+            print(f"Deleted benchmark tenant {tenant_id}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Canonical forms of entity values and threat-intel indicators, shared by enrichment-mcp.py
+and threat-intel-modal.py so that variants of the same user, IP, domain, hash or URL hit
+the same cache entries and search results.
+
+normalize_entity() mirrors public.normalize_entity_text
+(supabase/migrations/20261018000900_entity_normalization.sql), which builds
+ticket_entities.value_normalized; the two must change together. Postgres has no IDNA,
+so domains are stored as ingested (lowercased) and searched in both their ASCII and
+Unicode forms (entity_lookup_values).
+"""
+import re
+import ipaddress
+
+# Only ASCII whitespace is stripped, matching btrim(value, E' \t\r\n') in SQL
+WHITESPACE = " \t\r\n"
+
+# Hex digest length -> hash type
+HASH_TYPES = {32: "md5", 40: "sha1", 64: "sha256", 128: "sha512"}
+HEX_PATTERN = re.compile(r"^[0-9a-f]+$")
+
+URL_SCHEME_PATTERN = re.compile(r"^[A-Za-z][A-Za-z0-9+.-]*://")
+URL_PATTERN = re.compile(r"^([A-Za-z][A-Za-z0-9+.-]*)://([^/?#]*)([^#]*)")
+URL_HOST_PORT_PATTERN = re.compile(r"^(\[[^\]]*\]|[^:]*)(?::(.*))?$")
+URL_DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+
+def strip_value(value):
+    return value.strip(WHITESPACE)
+
+
+def lower_text(value):
+    """
+    lower() as Postgres does it with a libc locale: one character at a time, so a final
+    capital sigma becomes σ rather than ς and a dotted capital I becomes a plain i.
+    """
+    if "Σ" not in value and "İ" not in value:
+        return value.lower()
+    return "".join(char.lower()[0] for char in value)
+
+
+def normalize_lower(value):
+    return lower_text(strip_value(value))
+
+
+def normalize_user(value):
+    """Lowercased, with a down-level DOMAIN\\user logon rewritten as user@domain."""
+    value = normalize_lower(value)
+    domain, separator, user = value.partition("\\")
+    if separator and domain and user:
+        return f"{user}@{domain}"
+    return value
+
+
+def normalize_ip(value):
+    """
+    Canonical text of an IPv4/IPv6 address (compressed IPv6, IPv4-mapped IPv6 unwrapped,
+    [brackets] dropped). Anything that does not parse is only stripped and lowercased.
+    """
+    value = normalize_lower(value)
+    candidate = value[1:-1] if value.startswith("[") and value.endswith("]") else value
+    try:
+        address = ipaddress.ip_address(candidate)
+    except ValueError:
+        return value
+    if address.version == 6 and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    return str(address)
+
+
+def domain_to_ascii(domain):
+    """IDNA (punycode) form of a domain, or the domain unchanged if it cannot be encoded."""
+    try:
+        return domain.encode("idna").decode("ascii")
+    except UnicodeError:
+        return domain
+
+
+def domain_to_unicode(domain):
+    try:
+        return domain.encode("ascii").decode("idna")
+    except UnicodeError:
+        return domain
+
+
+def normalize_domain(value, idna=True):
+    """Lowercased without the trailing dot; with idna=True internationalized names become punycode."""
+    domain = normalize_lower(value).rstrip(".")
+    return domain_to_ascii(domain) if idna else domain
+
+
+def domain_variants(value):
+    """The distinct lowercased forms a domain may be stored under: as given, ASCII and Unicode."""
+    domain = normalize_domain(value, idna=False)
+    ascii_domain = domain_to_ascii(domain)
+    variants = [domain]
+    for variant in (ascii_domain, domain_to_unicode(ascii_domain)):
+        if variant not in variants:
+            variants.append(variant)
+    return variants
+
+
+def normalize_hash(value):
+    return normalize_lower(value)
+
+
+def detect_hash_type(value):
+    """md5/sha1/sha256/sha512 for a hex digest of that length, otherwise None."""
+    value = normalize_hash(value)
+    if not HEX_PATTERN.match(value):
+        return None
+    return HASH_TYPES.get(len(value))
+
+
+def normalize_url(value):
+    """
+    Canonical URL: http:// assumed when there is no scheme, scheme and host lowercased, the
+    host's trailing dot and a default port dropped, an empty path made "/", the fragment
+    removed. Path and query are kept as given (they are case sensitive).
+    """
+    value = strip_value(value)
+    if not value:
+        return value
+    if not URL_SCHEME_PATTERN.match(value):
+        value = "http://" + value
+    scheme, authority, rest = URL_PATTERN.match(value).groups()
+    scheme = scheme.lower()
+    userinfo = ""
+    if "@" in authority:
+        userinfo, authority = authority.rsplit("@", 1)
+        userinfo += "@"
+    host, port = URL_HOST_PORT_PATTERN.match(authority).groups()
+    host = lower_text(host)
+    if not host.startswith("["):
+        host = host.rstrip(".")
+    port = port or ""
+    if port and URL_DEFAULT_PORTS.get(scheme) != port:
+        port = ":" + port
+    else:
+        port = ""
+    if not rest or rest.startswith("?"):
+        rest = "/" + rest
+    return f"{scheme}://{userinfo}{host}{port}{rest}"
+
+
+# Entity normalizations by name, as stored in public.entity_types.normalization
+NORMALIZATIONS = {
+    "trim": strip_value,
+    "lower": normalize_lower,
+    "user": normalize_user,
+    "ip": normalize_ip,
+    "domain": lambda value: normalize_domain(value, idna=False),
+    "url": normalize_url,
+}
+
+
+def normalize_entity(normalization, value):
+    """Same result as public.normalize_entity_text(normalization, value)."""
+    return NORMALIZATIONS[normalization](value)
+
+
+def entity_lookup_values(normalization, value):
+    """The normalized values to look up in ticket_entities for one searched value."""
+    if normalization == "domain":
+        return domain_variants(value)
+    return [normalize_entity(normalization, value)]
@@ -0,0 +1,15 @@
+-- Baseline shape of the tickets table the enrichment MCP server reads and writes.
+-- A no-op against the hosted project (the table already exists); it lets a plain local
+-- Postgres stand in for Supabase when exercising the migrations and RPCs below.
+create table if not exists public.tickets (
+    id bigint generated by default as identity primary key,
+    tenant_id text not null,
+    created_at timestamptz not null default now(),
+    occurred_at timestamptz,
+    name text,
+    severity text,
+    status text,
+    closure_category text,
+    artifacts_and_assets jsonb,
+    related_alerts jsonb
+);
@@ -0,0 +1,42 @@
+-- Server-side, single round-trip merge of one entity's related tickets into
+-- tickets.related_alerts, replacing the SELECT + patch-in-Python + UPDATE cycle.
+--
+-- The UPDATE takes the row lock and recomputes from the latest committed value, so
+-- parallel enrichments of the same ticket each add their own key instead of
+-- overwriting each other's.
+
+-- Coerce a stored related_alerts value into an object holding every entity section,
+-- replacing missing or non-object sections with {} and keeping everything else.
+create or replace function public.normalize_related_alerts(alerts jsonb)
+returns jsonb
+language sql
+immutable
+as $$
+    select coalesce(case when jsonb_typeof(alerts) = 'object' then alerts end, '{}'::jsonb)
+        || (
+            select jsonb_object_agg(
+                section,
+                case when jsonb_typeof(alerts -> section) = 'object' then alerts -> section else '{}'::jsonb end
+            )
+            from unnest(array['users', 'assets', 'ips', 'domains', 'hashes', 'urls']) as section
+        )
+$$;
+
+-- related_alerts[p_entity_type][p_entity_value] = p_related_tickets for ticket p_ticket_id
+create or replace function public.merge_related_alerts(
+    p_ticket_id bigint,
+    p_entity_type text,
+    p_entity_value text,
+    p_related_tickets jsonb
+)
+returns void
+language sql
+as $$
+    update public.tickets
+    set related_alerts = public.normalize_related_alerts(related_alerts) || jsonb_build_object(
+        p_entity_type,
+        coalesce(public.normalize_related_alerts(related_alerts) -> p_entity_type, '{}'::jsonb)
+            || jsonb_build_object(p_entity_value, p_related_tickets)
+    )
+    where id = p_ticket_id
+$$;
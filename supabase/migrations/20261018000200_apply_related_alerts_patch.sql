@@ -0,0 +1,29 @@
+-- Merge a whole related_alerts patch ({"users": {"alice": [...]}, "ips": {...}, ...})
+-- into one ticket in a single atomic UPDATE. Used by enrich_ticket, which correlates
+-- every artifact of a ticket in one pass and writes the result once.
+
+-- Pure merge: each patched section is shallow-merged into the normalized stored section
+create or replace function public.apply_related_alerts_patch(alerts jsonb, patch jsonb)
+returns jsonb
+language sql
+immutable
+as $$
+    select base || coalesce(
+        (
+            select jsonb_object_agg(section, coalesce(base -> section, '{}'::jsonb) || entries)
+            from jsonb_each(patch) as p(section, entries)
+            where jsonb_typeof(entries) = 'object'
+        ),
+        '{}'::jsonb
+    )
+    from (select public.normalize_related_alerts(alerts) as base) as normalized
+$$;
+
+create or replace function public.merge_related_alerts_patch(p_ticket_id bigint, p_patch jsonb)
+returns void
+language sql
+as $$
+    update public.tickets
+    set related_alerts = public.apply_related_alerts_patch(related_alerts, p_patch)
+    where id = p_ticket_id
+$$;
@@ -0,0 +1,63 @@
+-- Bounded related_alerts: searches page their results and can store only the most recent
+-- related tickets per entity. The full match count is kept alongside under
+-- related_alerts.counts ({"users": {"alice": 1234}, ...}) so nothing is lost by truncating.
+
+-- Same as before, except the counts section is merged one level deeper (per entity type)
+-- so patching the count of one entity keeps the counts of every other entity
+create or replace function public.apply_related_alerts_patch(alerts jsonb, patch jsonb)
+returns jsonb
+language sql
+immutable
+as $$
+    select base || coalesce(
+        (
+            select jsonb_object_agg(
+                section,
+                case when section = 'counts' then
+                    coalesce(base -> 'counts', '{}'::jsonb) || coalesce(
+                        (
+                            select jsonb_object_agg(entity_type, coalesce(base -> 'counts' -> entity_type, '{}'::jsonb) || counts)
+                            from jsonb_each(entries) as c(entity_type, counts)
+                            where jsonb_typeof(counts) = 'object'
+                        ),
+                        '{}'::jsonb
+                    )
+                else
+                    coalesce(base -> section, '{}'::jsonb) || entries
+                end
+            )
+            from jsonb_each(patch) as p(section, entries)
+            where jsonb_typeof(entries) = 'object'
+        ),
+        '{}'::jsonb
+    )
+    from (select public.normalize_related_alerts(alerts) as base) as normalized
+$$;
+
+-- related_alerts[p_entity_type][p_entity_value] = p_related_tickets, and when p_total_count is
+-- given also related_alerts.counts[p_entity_type][p_entity_value] = p_total_count
+drop function if exists public.merge_related_alerts(bigint, text, text, jsonb);
+
+create or replace function public.merge_related_alerts(
+    p_ticket_id bigint,
+    p_entity_type text,
+    p_entity_value text,
+    p_related_tickets jsonb,
+    p_total_count bigint default null
+)
+returns void
+language sql
+as $$
+    update public.tickets
+    set related_alerts = public.apply_related_alerts_patch(
+        related_alerts,
+        jsonb_build_object(p_entity_type, jsonb_build_object(p_entity_value, p_related_tickets))
+            || case
+                when p_total_count is null then '{}'::jsonb
+                else jsonb_build_object('counts', jsonb_build_object(
+                    p_entity_type, jsonb_build_object(p_entity_value, p_total_count)
+                ))
+            end
+    )
+    where id = p_ticket_id
+$$;
@@ -0,0 +1,34 @@
+-- Incremental correlation keeps per-entity bookkeeping under related_alerts.correlation
+-- ({"users": {"alice": {"last_correlated_at": ..., "lookback_days": 7, "created_at": {...}}}}).
+-- Like counts, it is keyed by entity type first, so patches must merge it one level deeper
+-- to keep the state of every other entity.
+
+create or replace function public.apply_related_alerts_patch(alerts jsonb, patch jsonb)
+returns jsonb
+language sql
+immutable
+as $$
+    select base || coalesce(
+        (
+            select jsonb_object_agg(
+                section,
+                case when section in ('counts', 'correlation') then
+                    coalesce(base -> section, '{}'::jsonb) || coalesce(
+                        (
+                            select jsonb_object_agg(entity_type, coalesce(base -> section -> entity_type, '{}'::jsonb) || nested)
+                            from jsonb_each(entries) as n(entity_type, nested)
+                            where jsonb_typeof(nested) = 'object'
+                        ),
+                        '{}'::jsonb
+                    )
+                else
+                    coalesce(base -> section, '{}'::jsonb) || entries
+                end
+            )
+            from jsonb_each(patch) as p(section, entries)
+            where jsonb_typeof(entries) = 'object'
+        ),
+        '{}'::jsonb
+    )
+    from (select public.normalize_related_alerts(alerts) as base) as normalized
+$$;
@@ -0,0 +1,31 @@
+-- Indexes for the entity searches in enrichment-mcp.py. Each search filters
+--   artifacts_and_assets-><path> @> '[{"value": ...}]' and tenant_id = ... and created_at >= ...
+-- ordered by created_at desc, id desc. The containment predicate is served by one GIN
+-- expression index per entity path (jsonb_path_ops: smaller and faster than the default
+-- opclass, and @> is the only operator used); the expressions must stay identical to the
+-- ones PostgREST generates from the filter columns. The btree on
+-- (tenant_id, created_at desc, id desc) serves the tenant/window filter, the keyset order and
+-- the latest-ticket probe, and is combined with the GIN bitmap for selective entities.
+--
+-- On a large live table create these with CREATE INDEX CONCURRENTLY outside a transaction.
+
+create index if not exists tickets_tenant_created_idx
+    on public.tickets (tenant_id, created_at desc, id desc);
+
+create index if not exists tickets_users_gin_idx
+    on public.tickets using gin ((artifacts_and_assets -> 'users') jsonb_path_ops);
+
+create index if not exists tickets_assets_gin_idx
+    on public.tickets using gin ((artifacts_and_assets -> 'assets') jsonb_path_ops);
+
+create index if not exists tickets_ip_addresses_gin_idx
+    on public.tickets using gin ((artifacts_and_assets -> 'artifacts' -> 'ip_addresses') jsonb_path_ops);
+
+create index if not exists tickets_domains_gin_idx
+    on public.tickets using gin ((artifacts_and_assets -> 'artifacts' -> 'domains') jsonb_path_ops);
+
+create index if not exists tickets_hashes_gin_idx
+    on public.tickets using gin ((artifacts_and_assets -> 'artifacts' -> 'hashes') jsonb_path_ops);
+
+create index if not exists tickets_urls_gin_idx
+    on public.tickets using gin ((artifacts_and_assets -> 'artifacts' -> 'urls') jsonb_path_ops);
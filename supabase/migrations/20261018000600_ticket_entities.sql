@@ -0,0 +1,96 @@
+-- Normalized side table of every entity in tickets.artifacts_and_assets, one row per
+-- (ticket, entity type, value), kept in sync by a trigger on tickets. Entity searches become
+-- btree equality lookups on (tenant_id, entity_type, value_normalized) instead of JSONB
+-- containment over nested arrays. Existing tickets are loaded with
+-- scripts/backfill_ticket_entities.py (or select public.backfill_ticket_entities(from, to));
+-- enrichment-mcp.py only searches this table once ENTITY_TABLE_LOOKUPS=1 is set after that.
+--
+-- entity_type is the related_alerts section name (users, assets, ips, domains, hashes, urls).
+
+-- Must match normalize_entity_value() in enrichment-mcp.py
+create or replace function public.normalize_entity_value(entity_type text, value text)
+returns text
+language sql
+immutable
+as $$
+    select case
+        when entity_type = 'domains' then rtrim(lower(btrim(value)), '.')
+        when entity_type = 'hashes' then lower(btrim(value))
+        else btrim(value)
+    end
+$$;
+
+create or replace function public.extract_ticket_entities(artifacts jsonb)
+returns table (entity_type text, value_normalized text)
+language sql
+immutable
+as $$
+    select distinct paths.entity_type, public.normalize_entity_value(paths.entity_type, item ->> 'value')
+    from (
+        values
+            ('users', array['users']),
+            ('assets', array['assets']),
+            ('ips', array['artifacts', 'ip_addresses']),
+            ('domains', array['artifacts', 'domains']),
+            ('hashes', array['artifacts', 'hashes']),
+            ('urls', array['artifacts', 'urls'])
+    ) as paths (entity_type, path)
+    cross join lateral jsonb_array_elements(
+        case when jsonb_typeof(artifacts #> paths.path) = 'array' then artifacts #> paths.path else '[]'::jsonb end
+    ) as item
+    where jsonb_typeof(item) = 'object'
+        and jsonb_typeof(item -> 'value') = 'string'
+        and public.normalize_entity_value(paths.entity_type, item ->> 'value') <> ''
+$$;
+
+create table if not exists public.ticket_entities (
+    ticket_id bigint not null references public.tickets (id) on delete cascade,
+    entity_type text not null,
+    value_normalized text not null,
+    tenant_id text not null,
+    created_at timestamptz not null,
+    primary key (ticket_id, entity_type, value_normalized)
+);
+
+-- Serves the search: equality on the entity, window on created_at, keyset order, and an
+-- index-only count
+create index if not exists ticket_entities_lookup_idx
+    on public.ticket_entities (tenant_id, entity_type, value_normalized, created_at desc, ticket_id desc);
+
+create or replace function public.sync_ticket_entities()
+returns trigger
+language plpgsql
+as $$
+begin
+    if tg_op = 'UPDATE' then
+        delete from public.ticket_entities where ticket_id = new.id;
+    end if;
+    insert into public.ticket_entities (ticket_id, entity_type, value_normalized, tenant_id, created_at)
+    select new.id, e.entity_type, e.value_normalized, new.tenant_id, new.created_at
+    from public.extract_ticket_entities(new.artifacts_and_assets) as e;
+    return null;
+end
+$$;
+
+drop trigger if exists tickets_sync_entities on public.tickets;
+create trigger tickets_sync_entities
+    after insert or update of artifacts_and_assets, tenant_id, created_at on public.tickets
+    for each row execute function public.sync_ticket_entities();
+
+-- Load ticket_entities for tickets with p_from < id <= p_to; returns the rows inserted.
+-- Idempotent, so a backfill can be re-run or overlap the trigger.
+create or replace function public.backfill_ticket_entities(p_from bigint, p_to bigint)
+returns bigint
+language sql
+as $$
+    with inserted as (
+        insert into public.ticket_entities (ticket_id, entity_type, value_normalized, tenant_id, created_at)
+        select t.id, e.entity_type, e.value_normalized, t.tenant_id, t.created_at
+        from public.tickets as t
+        cross join lateral public.extract_ticket_entities(t.artifacts_and_assets) as e
+        where t.id > p_from and t.id <= p_to
+        on conflict do nothing
+        returning 1
+    )
+    select count(*) from inserted
+$$;
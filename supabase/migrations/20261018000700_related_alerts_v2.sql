@@ -0,0 +1,146 @@
+-- Compact related_alerts storage (version 2). Instead of a full copy of a related ticket's
+-- fields under every entity that links to it, each ticket's fields are stored once in a
+-- tickets map keyed by id and entity entries hold id lists:
+--
+--   v1: {"users": {"alice": [{"id": 7, "time": ..., "name": ...}]}, "ips": {"10.0.0.1": [{"id": 7, ...}]}}
+--   v2: {"version": 2, "tickets": {"7": {"time": ..., "name": ...}}, "users": {"alice": [7]}, "ips": {"10.0.0.1": [7]}}
+--
+-- counts and correlation are unchanged. Writes upgrade a stored v1 value on the fly and accept
+-- patches in either shape; tickets no entity references any more are dropped from the map.
+-- Readers that want the old shape use expand_related_alerts(), or select the
+-- related_alerts_expanded computed column through PostgREST.
+
+-- v1 (or partially compacted) value -> v2; a v2 value is returned unchanged apart from
+-- normalization, so this is safe to apply repeatedly and to patches as well as stored values
+create or replace function public.upgrade_related_alerts(alerts jsonb)
+returns jsonb
+language plpgsql
+immutable
+as $$
+declare
+    result jsonb := public.normalize_related_alerts(alerts);
+    tickets jsonb := case when jsonb_typeof(result -> 'tickets') = 'object' then result -> 'tickets' else '{}'::jsonb end;
+    section text;
+    entry record;
+    item jsonb;
+    ids jsonb;
+    compact jsonb;
+begin
+    foreach section in array array['users', 'assets', 'ips', 'domains', 'hashes', 'urls'] loop
+        compact := '{}'::jsonb;
+        for entry in select key, value from jsonb_each(result -> section) loop
+            ids := '[]'::jsonb;
+            if jsonb_typeof(entry.value) = 'array' then
+                for item in select value from jsonb_array_elements(entry.value) loop
+                    if jsonb_typeof(item) = 'object' and item ? 'id' then
+                        ids := ids || jsonb_build_array(item -> 'id');
+                        tickets := tickets || jsonb_build_object(item ->> 'id', item - 'id');
+                    elsif jsonb_typeof(item) in ('number', 'string') then
+                        ids := ids || jsonb_build_array(item);
+                    end if;
+                end loop;
+            end if;
+            compact := compact || jsonb_build_object(entry.key, ids);
+        end loop;
+        result := result || jsonb_build_object(section, compact);
+    end loop;
+    return result || jsonb_build_object('version', 2, 'tickets', tickets);
+end
+$$;
+
+-- v2 (or v1) value -> the v1 shape: entity entries expanded back to lists of ticket objects
+create or replace function public.expand_related_alerts(alerts jsonb)
+returns jsonb
+language sql
+immutable
+as $$
+    select (upgraded - 'version' - 'tickets') || (
+        select jsonb_object_agg(
+            section,
+            coalesce(
+                (
+                    select jsonb_object_agg(
+                        entry.key,
+                        coalesce(
+                            (
+                                select jsonb_agg(
+                                    jsonb_build_object('id', related.id)
+                                        || coalesce(upgraded -> 'tickets' -> (related.id #>> '{}'), '{}'::jsonb)
+                                    order by related.ord
+                                )
+                                from jsonb_array_elements(entry.value) with ordinality as related (id, ord)
+                            ),
+                            '[]'::jsonb
+                        )
+                    )
+                    from jsonb_each(upgraded -> section) as entry
+                ),
+                '{}'::jsonb
+            )
+        )
+        from unnest(array['users', 'assets', 'ips', 'domains', 'hashes', 'urls']) as section
+    )
+    from (select public.upgrade_related_alerts(alerts) as upgraded) as u
+$$;
+
+-- PostgREST computed column: select=id,related_alerts_expanded
+create or replace function public.related_alerts_expanded(ticket public.tickets)
+returns jsonb
+language sql
+stable
+as $$
+    select public.expand_related_alerts(ticket.related_alerts)
+$$;
+
+-- Merge a patch (v1 or v2 shape) into a stored value (v1 or v2), producing v2. Entity sections
+-- and the tickets map are shallow-merged, counts/correlation one level deeper, and tickets
+-- no longer referenced by any entity are dropped.
+create or replace function public.apply_related_alerts_patch(alerts jsonb, patch jsonb)
+returns jsonb
+language plpgsql
+immutable
+as $$
+declare
+    base jsonb := public.upgrade_related_alerts(alerts);
+    changes jsonb := public.upgrade_related_alerts(patch);
+    section text;
+    entries jsonb;
+    nested record;
+begin
+    for section, entries in select key, value from jsonb_each(changes) loop
+        if section = 'version' or jsonb_typeof(entries) <> 'object' then
+            continue;
+        elsif section in ('counts', 'correlation') then
+            for nested in select key, value from jsonb_each(entries) where jsonb_typeof(value) = 'object' loop
+                base := jsonb_set(
+                    base || jsonb_build_object(section, coalesce(base -> section, '{}'::jsonb)),
+                    array[section, nested.key],
+                    coalesce(base -> section -> nested.key, '{}'::jsonb) || nested.value
+                );
+            end loop;
+        else
+            base := base || jsonb_build_object(section, coalesce(base -> section, '{}'::jsonb) || entries);
+        end if;
+    end loop;
+
+    return base || jsonb_build_object('tickets', coalesce(
+        (
+            select jsonb_object_agg(stored.key, stored.value)
+            from jsonb_each(base -> 'tickets') as stored
+            where stored.key in (
+                select jsonb_array_elements_text(entry.value)
+                from unnest(array['users', 'assets', 'ips', 'domains', 'hashes', 'urls']) as entity_section
+                cross join lateral jsonb_each(base -> entity_section) as entry
+                where jsonb_typeof(entry.value) = 'array'
+            )
+        ),
+        '{}'::jsonb
+    ));
+end
+$$;
+
+-- Convert stored values still in the v1 shape. On a very large table run this in id ranges.
+update public.tickets
+set related_alerts = public.upgrade_related_alerts(related_alerts)
+where related_alerts is not null
+    and related_alerts ->> 'version' is distinct from '2';
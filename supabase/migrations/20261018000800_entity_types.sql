@@ -0,0 +1,199 @@
+-- Entity types as data instead of six hard-coded sections. public.entity_types mirrors
+-- ENTITY_TYPES in enrichment-mcp.py (section, path inside artifacts_and_assets and value
+-- normalization) and drives ticket_entities extraction and the related_alerts functions.
+--
+-- Adding a type: register_entity_type(...) in enrichment-mcp.py, then e.g.
+--   insert into public.entity_types values ('emails', array['artifacts', 'emails'], 'lower');
+-- and load the existing tickets with scripts/backfill_ticket_entities.py.
+
+create table if not exists public.entity_types (
+    entity_type text primary key,
+    path text[] not null,
+    normalization text not null default 'trim' check (normalization in ('trim', 'lower', 'domain'))
+);
+
+insert into public.entity_types (entity_type, path, normalization)
+values
+    ('users', array['users'], 'trim'),
+    ('assets', array['assets'], 'trim'),
+    ('ips', array['artifacts', 'ip_addresses'], 'trim'),
+    ('domains', array['artifacts', 'domains'], 'domain'),
+    ('hashes', array['artifacts', 'hashes'], 'lower'),
+    ('urls', array['artifacts', 'urls'], 'trim')
+on conflict (entity_type) do nothing;
+
+-- Must match ENTITY_NORMALIZERS in enrichment-mcp.py
+create or replace function public.normalize_entity_text(normalization text, value text)
+returns text
+language sql
+immutable
+as $$
+    select case normalization
+        when 'domain' then rtrim(lower(btrim(value)), '.')
+        when 'lower' then lower(btrim(value))
+        else btrim(value)
+    end
+$$;
+
+create or replace function public.normalize_entity_value(entity_type text, value text)
+returns text
+language sql
+stable
+as $$
+    select public.normalize_entity_text(
+        coalesce((select t.normalization from public.entity_types as t where t.entity_type = $1), 'trim'),
+        value
+    )
+$$;
+
+create or replace function public.entity_sections()
+returns text[]
+language sql
+stable
+as $$
+    select coalesce(array_agg(entity_type order by entity_type), '{}') from public.entity_types
+$$;
+
+create or replace function public.extract_ticket_entities(artifacts jsonb)
+returns table (entity_type text, value_normalized text)
+language sql
+stable
+as $$
+    select distinct types.entity_type, public.normalize_entity_text(types.normalization, item ->> 'value')
+    from public.entity_types as types
+    cross join lateral jsonb_array_elements(
+        case when jsonb_typeof(artifacts #> types.path) = 'array' then artifacts #> types.path else '[]'::jsonb end
+    ) as item
+    where jsonb_typeof(item) = 'object'
+        and jsonb_typeof(item -> 'value') = 'string'
+        and public.normalize_entity_text(types.normalization, item ->> 'value') <> ''
+$$;
+
+create or replace function public.normalize_related_alerts(alerts jsonb)
+returns jsonb
+language sql
+stable
+as $$
+    select coalesce(case when jsonb_typeof(alerts) = 'object' then alerts end, '{}'::jsonb)
+        || coalesce((
+            select jsonb_object_agg(
+                section,
+                case when jsonb_typeof(alerts -> section) = 'object' then alerts -> section else '{}'::jsonb end
+            )
+            from unnest(public.entity_sections()) as section
+        ), '{}'::jsonb)
+$$;
+
+create or replace function public.upgrade_related_alerts(alerts jsonb)
+returns jsonb
+language plpgsql
+stable
+as $$
+declare
+    result jsonb := public.normalize_related_alerts(alerts);
+    tickets jsonb := case when jsonb_typeof(result -> 'tickets') = 'object' then result -> 'tickets' else '{}'::jsonb end;
+    section text;
+    entry record;
+    item jsonb;
+    ids jsonb;
+    compact jsonb;
+begin
+    foreach section in array public.entity_sections() loop
+        compact := '{}'::jsonb;
+        for entry in select key, value from jsonb_each(result -> section) loop
+            ids := '[]'::jsonb;
+            if jsonb_typeof(entry.value) = 'array' then
+                for item in select value from jsonb_array_elements(entry.value) loop
+                    if jsonb_typeof(item) = 'object' and item ? 'id' then
+                        ids := ids || jsonb_build_array(item -> 'id');
+                        tickets := tickets || jsonb_build_object(item ->> 'id', item - 'id');
+                    elsif jsonb_typeof(item) in ('number', 'string') then
+                        ids := ids || jsonb_build_array(item);
+                    end if;
+                end loop;
+            end if;
+            compact := compact || jsonb_build_object(entry.key, ids);
+        end loop;
+        result := result || jsonb_build_object(section, compact);
+    end loop;
+    return result || jsonb_build_object('version', 2, 'tickets', tickets);
+end
+$$;
+
+create or replace function public.expand_related_alerts(alerts jsonb)
+returns jsonb
+language sql
+stable
+as $$
+    select (upgraded - 'version' - 'tickets') || coalesce((
+        select jsonb_object_agg(
+            section,
+            coalesce(
+                (
+                    select jsonb_object_agg(
+                        entry.key,
+                        coalesce(
+                            (
+                                select jsonb_agg(
+                                    jsonb_build_object('id', related.id)
+                                        || coalesce(upgraded -> 'tickets' -> (related.id #>> '{}'), '{}'::jsonb)
+                                    order by related.ord
+                                )
+                                from jsonb_array_elements(entry.value) with ordinality as related (id, ord)
+                            ),
+                            '[]'::jsonb
+                        )
+                    )
+                    from jsonb_each(upgraded -> section) as entry
+                ),
+                '{}'::jsonb
+            )
+        )
+        from unnest(public.entity_sections()) as section
+    ), '{}'::jsonb)
+    from (select public.upgrade_related_alerts(alerts) as upgraded) as u
+$$;
+
+create or replace function public.apply_related_alerts_patch(alerts jsonb, patch jsonb)
+returns jsonb
+language plpgsql
+stable
+as $$
+declare
+    base jsonb := public.upgrade_related_alerts(alerts);
+    changes jsonb := public.upgrade_related_alerts(patch);
+    section text;
+    entries jsonb;
+    nested record;
+begin
+    for section, entries in select key, value from jsonb_each(changes) loop
+        if section = 'version' or jsonb_typeof(entries) <> 'object' then
+            continue;
+        elsif section in ('counts', 'correlation') then
+            for nested in select key, value from jsonb_each(entries) where jsonb_typeof(value) = 'object' loop
+                base := jsonb_set(
+                    base || jsonb_build_object(section, coalesce(base -> section, '{}'::jsonb)),
+                    array[section, nested.key],
+                    coalesce(base -> section -> nested.key, '{}'::jsonb) || nested.value
+                );
+            end loop;
+        else
+            base := base || jsonb_build_object(section, coalesce(base -> section, '{}'::jsonb) || entries);
+        end if;
+    end loop;
+
+    return base || jsonb_build_object('tickets', coalesce(
+        (
+            select jsonb_object_agg(stored.key, stored.value)
+            from jsonb_each(base -> 'tickets') as stored
+            where stored.key in (
+                select jsonb_array_elements_text(entry.value)
+                from unnest(public.entity_sections()) as entity_section
+                cross join lateral jsonb_each(base -> entity_section) as entry
+                where jsonb_typeof(entry.value) = 'array'
+            )
+        ),
+        '{}'::jsonb
+    ));
+end
+$$;
@@ -0,0 +1,138 @@
+-- Canonical entity values in ticket_entities, so that variants of one entity find each
+-- other: users are lowercased with DOMAIN\user rewritten as user@domain, IP addresses are
+-- reduced to their canonical text (compressed IPv6, IPv4-mapped IPv6 unwrapped), URLs get a
+-- lowercased scheme and host without default port or fragment, assets are lowercased.
+--
+-- normalize_entity_text must match normalize_entity() in normalization.py. Domains keep the
+-- 'domain' normalization: Postgres has no IDNA, so enrichment-mcp.py searches both the ASCII
+-- and the Unicode form of a domain instead.
+
+-- Canonical text of an IP address, or the lowercased value when it is not one. Only full
+-- dotted quads without leading zeros are taken as IPv4 (what Python's ipaddress accepts).
+create or replace function public.normalize_ip_text(value text)
+returns text
+language plpgsql
+immutable
+as $$
+declare
+    candidate text := lower(btrim(value, E' \t\r\n'));
+    address inet;
+    low bigint;
+begin
+    if candidate like '[%]' then
+        candidate := substr(candidate, 2, length(candidate) - 2);
+    end if;
+    if candidate ~ '^((25[0-5]|2[0-4][0-9]|1[0-9][0-9]|[1-9]?[0-9])\.){3}(25[0-5]|2[0-4][0-9]|1[0-9][0-9]|[1-9]?[0-9])$'
+        or (candidate ~ '^[0-9a-f:.]+$' and position(':' in candidate) > 0) then
+        begin
+            address := candidate::inet;
+        exception when others then
+            return lower(btrim(value, E' \t\r\n'));
+        end;
+        if family(address) = 6 and address << '::ffff:0.0.0.0/96'::inet then
+            address := '0.0.0.0'::inet + (address - '::ffff:0.0.0.0'::inet);
+        elsif family(address) = 6 and address << '::/96'::inet then
+            -- Postgres prints IPv4-compatible addresses as ::a.b.c.d, Python in hex
+            low := address - '::'::inet;
+            if low = 0 then
+                return '::';
+            elsif low > 65535 then
+                return '::' || to_hex(low >> 16) || ':' || to_hex(low & 65535);
+            end if;
+            return '::' || to_hex(low);
+        end if;
+        return host(address);
+    end if;
+    return lower(btrim(value, E' \t\r\n'));
+end
+$$;
+
+-- Same steps as normalize_url() in normalization.py
+create or replace function public.normalize_url_text(value text)
+returns text
+language plpgsql
+immutable
+as $$
+declare
+    url text := btrim(value, E' \t\r\n');
+    parts text[];
+    scheme text;
+    authority text;
+    rest text;
+    userinfo text := '';
+    host_port text[];
+    host text;
+    port text;
+begin
+    if url = '' then
+        return url;
+    end if;
+    if url !~ '^[A-Za-z][A-Za-z0-9+.-]*://' then
+        url := 'http://' || url;
+    end if;
+    parts := regexp_match(url, '^([A-Za-z][A-Za-z0-9+.-]*)://([^/?#]*)([^#]*)');
+    scheme := lower(parts[1]);
+    authority := parts[2];
+    rest := parts[3];
+    if position('@' in authority) > 0 then
+        userinfo := substring(authority from '^(.*)@') || '@';
+        authority := substring(authority from '^.*@(.*)$');
+    end if;
+    host_port := regexp_match(authority, '^(\[[^\]]*\]|[^:]*)(?::(.*))?$');
+    host := lower(host_port[1]);
+    if left(host, 1) <> '[' then
+        host := rtrim(host, '.');
+    end if;
+    port := coalesce(host_port[2], '');
+    if port <> '' and port is distinct from (case scheme when 'http' then '80' when 'https' then '443' end) then
+        port := ':' || port;
+    else
+        port := '';
+    end if;
+    if rest = '' or left(rest, 1) = '?' then
+        rest := '/' || rest;
+    end if;
+    return scheme || '://' || userinfo || host || port || rest;
+end
+$$;
+
+alter table public.entity_types drop constraint if exists entity_types_normalization_check;
+alter table public.entity_types add constraint entity_types_normalization_check
+    check (normalization in ('trim', 'lower', 'user', 'ip', 'domain', 'url'));
+
+create or replace function public.normalize_entity_text(normalization text, value text)
+returns text
+language sql
+immutable
+as $$
+    select case normalization
+        when 'lower' then lower(btrim(value, E' \t\r\n'))
+        when 'user' then regexp_replace(lower(btrim(value, E' \t\r\n')), '^([^\\]+)\\(.+)$', '\2@\1')
+        when 'ip' then public.normalize_ip_text(value)
+        when 'domain' then rtrim(lower(btrim(value, E' \t\r\n')), '.')
+        when 'url' then public.normalize_url_text(value)
+        else btrim(value, E' \t\r\n')
+    end
+$$;
+
+update public.entity_types as t
+set normalization = v.normalization
+from (
+    values ('users', 'user'), ('assets', 'lower'), ('ips', 'ip'), ('urls', 'url')
+) as v (entity_type, normalization)
+where t.entity_type = v.entity_type;
+
+-- Re-normalize stored rows: add the canonical value, then drop the old one. Variants of one
+-- entity in the same ticket collapse into a single row. On a very large table prefer a
+-- truncate of ticket_entities followed by scripts/backfill_ticket_entities.py.
+insert into public.ticket_entities (ticket_id, entity_type, value_normalized, tenant_id, created_at)
+select e.ticket_id, e.entity_type, public.normalize_entity_text(t.normalization, e.value_normalized), e.tenant_id, e.created_at
+from public.ticket_entities as e
+join public.entity_types as t on t.entity_type = e.entity_type
+where e.value_normalized <> public.normalize_entity_text(t.normalization, e.value_normalized)
+on conflict do nothing;
+
+delete from public.ticket_entities as e
+using public.entity_types as t
+where t.entity_type = e.entity_type
+    and e.value_normalized <> public.normalize_entity_text(t.normalization, e.value_normalized);
@@ -0,0 +1,16 @@
+-- Row level security for ticket_entities. Its rows (tenant, entity values, ticket ids) are
+-- as sensitive as the tickets they come from and PostgREST exposes the table to the anon
+-- and authenticated roles, so a row is visible and writable exactly when its ticket is:
+-- the policy defers to whatever policies apply to public.tickets for the current role.
+--
+-- The sync trigger runs as the role that wrote the ticket, which can see that ticket, so
+-- ingestion keeps working; ON DELETE CASCADE is not subject to RLS. Roles that bypass RLS
+-- (service_role, postgres) are unaffected, including scripts/backfill_ticket_entities.py.
+
+alter table public.ticket_entities enable row level security;
+
+drop policy if exists ticket_entities_follow_tickets on public.ticket_entities;
+create policy ticket_entities_follow_tickets on public.ticket_entities
+    for all
+    using (exists (select 1 from public.tickets as t where t.id = ticket_entities.ticket_id))
+    with check (exists (select 1 from public.tickets as t where t.id = ticket_entities.ticket_id));
@@ -0,0 +1,17 @@
+-- Row level security for entity_types. The table decides which paths of
+-- artifacts_and_assets are extracted into ticket_entities and how their values are
+-- normalized for every tenant, so API roles may read it but never change it: a stray insert
+-- or update through PostgREST would silently re-route extraction for all tickets.
+--
+-- Reads stay open because the ticket_entities sync trigger and the related_alerts functions
+-- run as the role that wrote the ticket. New types are added by migration, as postgres or
+-- service_role, which bypass RLS.
+
+alter table public.entity_types enable row level security;
+
+drop policy if exists entity_types_read_only on public.entity_types;
+create policy entity_types_read_only on public.entity_types
+    for select
+    using (true);
+
+revoke insert, update, delete, truncate on public.entity_types from anon, authenticated;
@@ -0,0 +1,162 @@
+"""
+Per-stage latency for enrichment-mcp.py and threat-intel-modal.py: timing spans that are
+also OpenTelemetry spans, and Prometheus-style histograms rendered in the text exposition
+format (served by /metrics and the metrics://prometheus MCP resource).
+
+Spans go through the OpenTelemetry API when it is installed, which does nothing until a
+tracer provider is configured. OTEL_TRACES_EXPORTER=console or otlp installs the SDK
+provider with that exporter (needs opentelemetry-sdk, plus opentelemetry-exporter-otlp for
+otlp, configured by the usual OTEL_EXPORTER_OTLP_* variables). Histograms are always kept.
+"""
+import os
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+TRACES_EXPORTER = os.environ.get("OTEL_TRACES_EXPORTER", "none").lower()
+
+# Upper bounds in seconds, from a cache hit to a full page render with OCR
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+def escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def format_labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in pairs) + "}"
+
+
+class Histogram:
+    """Bucketed latency distribution per label set, rendered like a Prometheus client histogram."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        # Index len(buckets) is the +Inf bucket
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"buckets": [0] * (len(self.buckets) + 1), "sum": 0.0}
+            series["buckets"][index] += 1
+            series["sum"] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(values["buckets"]), values["sum"]) for key, values in self._series.items()}
+        for key, (buckets, total) in sorted(series.items()):
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), buckets):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f"{self.name}_bucket{format_labels(labels + [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(labels)} {total}")
+            lines.append(f"{self.name}_count{format_labels(labels)} {cumulative}")
+        return "\n".join(lines)
+
+
+class Span:
+    """Handle yielded by Telemetry.span: annotate the OpenTelemetry span or mark the stage failed."""
+
+    def __init__(self, otel_span=None):
+        self._otel_span = otel_span
+        self.outcome = "ok"
+
+    def set_attribute(self, key, value):
+        if self._otel_span is not None and value is not None:
+            self._otel_span.set_attribute(key, value)
+
+    def fail(self, message):
+        """Record the stage as an error without raising (for code that returns error payloads)."""
+        self.outcome = "error"
+        if self._otel_span is not None:
+            self._otel_span.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR, message))
+
+
+def configure_tracing(service):
+    """Install an SDK tracer provider for OTEL_TRACES_EXPORTER; the API stays a no-op otherwise."""
+    if otel_trace is None or TRACES_EXPORTER in ("", "none"):
+        return
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+        if TRACES_EXPORTER == "otlp":
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            exporter = OTLPSpanExporter()
+        else:
+            exporter = ConsoleSpanExporter()
+    except ImportError as import_error:
+        print(f"Tracing disabled, OpenTelemetry SDK or exporter not installed: {import_error}")
+        return
+    provider = TracerProvider(resource=Resource.create({"service.name": service}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    otel_trace.set_tracer_provider(provider)
+
+
+class Telemetry:
+    """
+    Spans and histograms of one service. Every span is observed in
+    <service>_stage_duration_seconds, labelled by stage, outcome and the span attributes
+    named in stage_labels (keep those low-cardinality: entity or indicator types, not values).
+    """
+
+    def __init__(self, service, stage_labels=()):
+        self.service = service
+        self.stage_labels = tuple(stage_labels)
+        self._histograms = []
+        self.stage_seconds = self.histogram(
+            f"{service}_stage_duration_seconds",
+            f"Duration of {service} processing stages in seconds.",
+            ("stage",) + self.stage_labels + ("outcome",),
+        )
+        configure_tracing(service)
+        self.tracer = otel_trace.get_tracer(service) if otel_trace is not None else None
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        histogram = Histogram(name, documentation, labelnames, buckets)
+        self._histograms.append(histogram)
+        return histogram
+
+    @contextmanager
+    def span(self, stage, **attributes):
+        """Time one stage as span "<service>.<stage>" with `attributes`; exceptions mark it failed."""
+        started = time.perf_counter()
+        handle = Span()
+        try:
+            if self.tracer is None:
+                yield handle
+            else:
+                otel_attributes = {key: value for key, value in attributes.items() if value is not None}
+                with self.tracer.start_as_current_span(f"{self.service}.{stage}", attributes=otel_attributes) as otel_span:
+                    handle._otel_span = otel_span
+                    yield handle
+        except BaseException as error:
+            # CancelledError and friends are not failures of the stage itself
+            handle.outcome = "error" if isinstance(error, Exception) else "cancelled"
+            raise
+        finally:
+            labels = {name: attributes.get(name, "") for name in self.stage_labels}
+            self.stage_seconds.observe(time.perf_counter() - started, stage=stage, outcome=handle.outcome, **labels)
+
+    def render(self):
+        """All histograms in the Prometheus text exposition format."""
+        return "\n".join(histogram.render() for histogram in self._histograms) + "\n"
@@ -1,6 +1,5 @@
 import os
-import sys
-import io
+import asyncio
 import time
 import socket
 import uuid
@@ -8,14 +7,31 @@ import base64
 import hashlib
 import subprocess
 import re
+import io
+import queue
+import functools
+import sqlite3
+import json
+import random
+import threading
 from datetime import datetime
-from contextlib import contextmanager
-from typing import Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import List, Optional
 
 import requests
-import pychrome
-import pytesseract
+import websockets
 import modal
+from PIL import Image
+
+from normalization import detect_hash_type, normalize_domain, normalize_hash, normalize_ip, normalize_url
+from telemetry import Telemetry
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
 
 # Don't import FastAPI at the module level - import inside the function
 # This allows modal serve to work without FastAPI installed locally
@@ -24,6 +40,10 @@ import modal
 # Create Modal app and image
 app = modal.App("rasterize")
 
+# Physical cores reserved per container. Read where the app is deployed and baked into the
+# image environment, so the container sizes its OCR pool from the same number
+CONTAINER_CPU = float(os.environ.get("CONTAINER_CPU", "2"))
+
 # Create custom image with all dependencies
 image = (
     modal.Image.debian_slim()
@@ -41,20 +61,38 @@ image = (
         "libdrm2",
         "libgbm1",
 
-        # OCR
+        # OCR (headers and toolchain let pip build tesserocr against the system libtesseract)
         "tesseract-ocr",
+        "libtesseract-dev",
+        "libleptonica-dev",
+        "pkg-config",
+        "g++",
 
         # Utilities
         "ca-certificates",
         "wget",
     )
     .pip_install(
-        "pychrome",
+        "websockets",
         "pillow",
-        "pytesseract",
+        "tesserocr",
+        "redis",
         "psutil",
         "fastapi[standard]"
     )
+    .env({"CONTAINER_CPU": str(CONTAINER_CPU)})
+    # Indicator normalization and telemetry shared with enrichment-mcp.py
+    .add_local_python_source("normalization", "telemetry")
+)
+
+# Per-stage latency of a lookup (Chrome start, tab, navigation, page wait, DOM, screenshot,
+# OCR) for /metrics and, when OTEL_TRACES_EXPORTER is set, as OpenTelemetry spans.
+# Histograms are per container, like the /pool and /cache metrics.
+telemetry = Telemetry("threat_intel", stage_labels=("indicator_type",))
+http_request_seconds = telemetry.histogram(
+    "threat_intel_http_request_duration_seconds",
+    "Duration of HTTP requests to the Rasterize API in seconds.",
+    ("method", "path", "status"),
 )
 
 
@@ -142,47 +180,389 @@ def terminate_chrome(process):
             except Exception as kill_error:
                 print(f"Error force killing Chrome: {kill_error}")
 
-def cleanup_tab_and_browser(tab, browser):
-    """Properly cleanup tab and browser to avoid WebSocket errors."""
-    @contextmanager
-    def suppress_all_output():
-        """Suppress both stdout and stderr."""
-        old_stdout = sys.stdout
-        old_stderr = sys.stderr
-        sys.stdout = io.StringIO()
-        sys.stderr = io.StringIO()
+def fetch_devtools_version(port):
+    """Read Chromium's /json/version, which carries the browser-level WebSocket URL."""
+    response = requests.get(f"http://127.0.0.1:{port}/json/version", timeout=5)
+    response.raise_for_status()
+    return response.json()
+
+
+class CDPSession:
+    """
+    Minimal asyncio Chrome DevTools Protocol client over one WebSocket.
+
+    Keeps the shape of the pychrome Tab interface this module was first written against:
+    `await call_method(method, **params)` and `set_listener(event, callback)`.
+    Listeners run on the event loop and must not block.
+    """
+
+    def __init__(self, websocket_url, target_id=None):
+        self.websocket_url = websocket_url
+        self.target_id = target_id
+        self.closed = False
+        self._ws = None
+        self._reader = None
+        self._next_id = 0
+        self._pending = {}
+        self._listeners = {}
+
+    async def start(self):
+        self._ws = await websockets.connect(self.websocket_url, max_size=None, ping_interval=None)
+        self._reader = asyncio.create_task(self._read_loop())
+
+    async def _read_loop(self):
         try:
-            yield
+            async for raw in self._ws:
+                message = json.loads(raw)
+                if "id" in message:
+                    future = self._pending.get(message["id"])
+                    if future is not None and not future.done():
+                        future.set_result(message)
+                elif "method" in message:
+                    listener = self._listeners.get(message["method"])
+                    if listener is not None:
+                        try:
+                            listener(**message.get("params", {}))
+                        except Exception as e:
+                            print(f"CDP listener for {message['method']} failed: {e}")
+        except Exception as e:
+            if not self.closed:
+                print(f"CDP connection to {self.websocket_url} lost: {e}")
         finally:
-            sys.stdout = old_stdout
-            sys.stderr = old_stderr
-    
-    with suppress_all_output():
-        # Stop the tab first (stops WebSocket communication)
-        if tab:
+            self.closed = True
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(Exception("CDP connection closed"))
+
+    async def call_method(self, _method, _timeout=30, **params):
+        if self.closed:
+            raise Exception(f"Cannot call {_method}: CDP connection is closed")
+
+        self._next_id += 1
+        message_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+        try:
+            await self._ws.send(json.dumps({"id": message_id, "method": _method, "params": params}))
+            message = await asyncio.wait_for(future, _timeout)
+        except asyncio.TimeoutError:
+            raise Exception(f"Calling {_method} timed out")
+        finally:
+            self._pending.pop(message_id, None)
+
+        if "error" in message:
+            raise Exception(f"calling method: {_method} error: {message['error'].get('message')}")
+        return message.get("result", {})
+
+    def set_listener(self, event, callback):
+        if callback is None:
+            self._listeners.pop(event, None)
+        else:
+            self._listeners[event] = callback
+
+    async def stop(self):
+        self.closed = True
+        if self._ws is not None:
             try:
-                tab.stop()
-            except:
+                await self._ws.close()
+            except Exception:
                 pass
-        
-        # Small delay to ensure WebSocket is closed
-        time.sleep(0.5)
-        
-        # Close the tab
-        if tab and browser:
+        if self._reader is not None:
             try:
-                browser.close_tab(tab)
-            except:
+                await self._reader
+            except Exception:
                 pass
 
+
+# Browser pool configuration (overridable through the container environment)
+BROWSER_POOL_SIZE = int(os.environ.get("BROWSER_POOL_SIZE", "2"))
+BROWSER_TABS_PER_BROWSER = int(os.environ.get("BROWSER_TABS_PER_BROWSER", "5"))
+BROWSER_MAX_NAVIGATIONS = int(os.environ.get("BROWSER_MAX_NAVIGATIONS", "100"))
+BROWSER_ACQUIRE_TIMEOUT = float(os.environ.get("BROWSER_ACQUIRE_TIMEOUT", "60"))
+
+
+class PooledBrowser:
+    """A warm Chromium process plus a browser-level CDP session used to open isolated tabs."""
+
+    def __init__(self, process, port, session):
+        self.process = process
+        self.port = port
+        self.session = session
+        self.active_tabs = 0
+        self.navigations = 0
+        self.retiring = False
+        self.started_at = time.time()
+
+    @classmethod
+    async def launch(cls):
+        with telemetry.span("chrome_start"):
+            # Chromium start-up polls the debugging port with blocking calls; keep it off the loop
+            process, port = await asyncio.to_thread(start_chrome)
+            if not process:
+                raise Exception("Failed to start Chrome")
+
+            try:
+                version = await asyncio.to_thread(fetch_devtools_version, port)
+                session = CDPSession(version["webSocketDebuggerUrl"])
+                await session.start()
+            except Exception:
+                await asyncio.to_thread(terminate_chrome, process)
+                raise
+        return cls(process, port, session)
+
+    def is_alive(self):
+        """Cheap liveness check: the Chromium process has not exited."""
+        return self.process.poll() is None
+
+    async def is_healthy(self):
+        """Full health check: process alive and the browser answering over CDP."""
+        if not self.is_alive() or self.session.closed:
+            return False
+        try:
+            await self.session.call_method("Browser.getVersion", _timeout=2)
+            return True
+        except Exception:
+            return False
+
+    async def open_tab(self):
+        """Open a tab inside a fresh browser context so requests never share cookies or cache."""
+        context_id = (await self.session.call_method("Target.createBrowserContext", _timeout=10))["browserContextId"]
+        try:
+            target_id = (await self.session.call_method(
+                "Target.createTarget",
+                url="about:blank",
+                browserContextId=context_id,
+                _timeout=10
+            ))["targetId"]
+        except Exception:
+            await self._dispose_context(context_id)
+            raise
+
+        tab = CDPSession(f"ws://127.0.0.1:{self.port}/devtools/page/{target_id}", target_id=target_id)
+        return tab, context_id
+
+    async def close_tab(self, tab, context_id):
+        """Close the tab's WebSocket, close the target and dispose of its browser context."""
+        await tab.stop()
+        try:
+            await self.session.call_method("Target.closeTarget", targetId=tab.target_id, _timeout=5)
+        except Exception:
+            pass
+        await self._dispose_context(context_id)
+
+    async def _dispose_context(self, context_id):
+        try:
+            await self.session.call_method("Target.disposeBrowserContext", browserContextId=context_id, _timeout=5)
+        except Exception:
+            pass
+
+    async def close(self):
+        await self.session.stop()
+        await asyncio.to_thread(terminate_chrome, self.process)
+
+
+class BrowserPool:
+    """
+    Container-lifetime pool of warm Chromium processes.
+
+    Each browser serves up to `tabs_per_browser` concurrent tabs. A browser is
+    retired once it has served `max_navigations` tabs or is found unhealthy,
+    and a replacement is started so the pool stays at `size` browsers. All
+    methods run on the ASGI event loop that owns the CDP connections.
+    """
+
+    def __init__(
+        self,
+        size=BROWSER_POOL_SIZE,
+        tabs_per_browser=BROWSER_TABS_PER_BROWSER,
+        max_navigations=BROWSER_MAX_NAVIGATIONS,
+        acquire_timeout=BROWSER_ACQUIRE_TIMEOUT
+    ):
+        self.size = size
+        self.tabs_per_browser = tabs_per_browser
+        self.max_navigations = max_navigations
+        self.acquire_timeout = acquire_timeout
+
+        self._browsers = []
+        self._starting = 0
+        self._waiting = 0
+        self._cond = asyncio.Condition()
+        self._background = set()
+        self._stats = {
+            "tabs_served": 0,
+            "browsers_started": 0,
+            "browsers_recycled": 0,
+            "browser_crashes": 0,
+            "acquire_timeouts": 0,
+        }
+
+    async def start(self):
+        """Start browsers until the pool is at its target size."""
+        await self._top_up()
+
+    async def shutdown(self):
+        browsers = self._browsers
+        self._browsers = []
+        await asyncio.gather(*(pooled.close() for pooled in browsers), return_exceptions=True)
+
+    def _spawn(self, coro):
+        """Run a pool maintenance coroutine in the background, keeping a reference until it ends."""
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _launch_one(self):
+        try:
+            pooled = await PooledBrowser.launch()
+        except Exception as e:
+            print(f"Failed to start pooled browser: {e}")
+            pooled = None
+
+        async with self._cond:
+            self._starting -= 1
+            if pooled:
+                self._browsers.append(pooled)
+                self._stats["browsers_started"] += 1
+                self._cond.notify_all()
+
+    async def _top_up(self):
+        missing = self.size - len(self._browsers) - self._starting
+        if missing <= 0:
+            return
+        self._starting += missing
+        await asyncio.gather(*(self._launch_one() for _ in range(missing)))
+
+    def _pick(self):
+        """Return the least-loaded browser with a free tab slot."""
+        for pooled in list(self._browsers):
+            if not pooled.retiring and not pooled.is_alive():
+                print(f"Pooled browser on port {pooled.port} exited, recycling")
+                pooled.retiring = True
+                self._stats["browser_crashes"] += 1
+            if pooled.retiring and pooled.active_tabs == 0:
+                self._browsers.remove(pooled)
+                self._spawn(pooled.close())
+
+        candidates = [
+            pooled for pooled in self._browsers
+            if not pooled.retiring and pooled.active_tabs < self.tabs_per_browser
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda pooled: pooled.active_tabs)
+
+    async def _acquire(self):
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            pooled = self._pick()
+            if pooled:
+                pooled.active_tabs += 1
+                pooled.navigations += 1
+                if pooled.navigations >= self.max_navigations:
+                    pooled.retiring = True
+                self._stats["tabs_served"] += 1
+                return pooled
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._stats["acquire_timeouts"] += 1
+                raise Exception("Timed out waiting for a free browser tab")
+
+            # Replace retired or crashed browsers in the background while we wait
+            if self.size - len(self._browsers) - self._starting > 0:
+                self._spawn(self._top_up())
+
+            self._waiting += 1
+            try:
+                async with self._cond:
+                    await asyncio.wait_for(self._cond.wait(), min(remaining, 1.0))
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self._waiting -= 1
+
+    async def _release(self, pooled, healthy):
+        pooled.active_tabs -= 1
+        if not healthy and not pooled.retiring:
+            pooled.retiring = True
+            self._stats["browser_crashes"] += 1
+
+        retired = pooled.retiring and pooled.active_tabs == 0 and pooled in self._browsers
+        if retired:
+            self._browsers.remove(pooled)
+            self._stats["browsers_recycled"] += 1
+
+        async with self._cond:
+            self._cond.notify_all()
+
+        # Closing the old browser and starting its replacement happen in the background
+        # so the request that released the last tab is not held up by them
+        if retired:
+            self._spawn(pooled.close())
+            self._spawn(self._top_up())
+
+    @asynccontextmanager
+    async def tab(self):
+        """Yield a started tab in an isolated browser context from a warm browser."""
+        with telemetry.span("tab_acquire"):
+            pooled = await self._acquire()
+        tab = None
+        context_id = None
+        healthy = True
+        try:
+            with telemetry.span("tab_open"):
+                tab, context_id = await pooled.open_tab()
+                await tab.start()
+            yield tab
+        except Exception:
+            healthy = await pooled.is_healthy()
+            raise
+        finally:
+            if tab:
+                await pooled.close_tab(tab, context_id)
+            await self._release(pooled, healthy)
+
+    def metrics(self):
+        """Pool size and occupancy snapshot."""
+        capacity = len(self._browsers) * self.tabs_per_browser
+        in_use = sum(pooled.active_tabs for pooled in self._browsers)
+        now = time.time()
+        return {
+            "size": len(self._browsers),
+            "target_size": self.size,
+            "starting": self._starting,
+            "tabs_per_browser": self.tabs_per_browser,
+            "tab_capacity": capacity,
+            "tabs_in_use": in_use,
+            "occupancy": round(in_use / capacity, 3) if capacity else 0.0,
+            "waiting": self._waiting,
+            **self._stats,
+            "browsers": [
+                {
+                    "pid": pooled.process.pid,
+                    "port": pooled.port,
+                    "active_tabs": pooled.active_tabs,
+                    "navigations": pooled.navigations,
+                    "retiring": pooled.retiring,
+                    "age_seconds": round(now - pooled.started_at, 1),
+                }
+                for pooled in self._browsers
+            ],
+        }
+
+
+# One pool per container, started by the web app's lifespan on the event loop that serves requests
+browser_pool = BrowserPool()
+
 def generate_run_id():
     """Generate a unique ID for each run combining timestamp and random string."""
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     random_str = str(uuid.uuid4())[:8]
     return f"{timestamp}_{random_str}"
 
+@functools.lru_cache(maxsize=None)
 def get_tesseract_path():
-    """Get the appropriate tesseract path based on the environment."""
+    """Get the appropriate tesseract path based on the environment (resolved once per container)."""
     possible_paths = ['tesseract']
     
     for path in possible_paths:
@@ -202,6 +582,201 @@ def get_tesseract_path():
     
     raise Exception("Tesseract not found in common locations. Please ensure it is installed correctly.")
 
+@functools.lru_cache(maxsize=None)
+def get_tessdata_dir(tesseract_cmd):
+    """Locate the installed language data by asking tesseract where it loads it from."""
+    if os.environ.get("TESSDATA_PREFIX"):
+        return os.environ["TESSDATA_PREFIX"]
+
+    process = subprocess.run(
+        [tesseract_cmd, "--list-langs"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=True
+    )
+    # First line looks like: List of available languages in "/usr/share/tesseract-ocr/5/tessdata/" (2):
+    match = re.search(r'"([^"]+)"', process.stdout.decode(errors="replace"))
+    if not match:
+        raise Exception("Could not determine the tesseract language data directory")
+    return match.group(1)
+
+# Verdict-region OCR tuning: padding around the detection widget clip, crop upscaling,
+# the grayscale cut-off for binarization and Tesseract page segmentation modes
+# (6 = single uniform block of text for the crop, 3 = fully automatic for full frames)
+OCR_CLIP_PADDING = 16
+OCR_UPSCALE_FACTOR = int(os.environ.get("OCR_UPSCALE_FACTOR", "2"))
+OCR_BINARIZE_THRESHOLD = int(os.environ.get("OCR_BINARIZE_THRESHOLD", "160"))
+OCR_CLIP_PSM = 6
+OCR_FULL_PAGE_PSM = 3
+
+# Debug screenshots are off by default; set a sample rate (0-1) to keep a fraction of them
+DEBUG_SCREENSHOT_SAMPLE_RATE = float(os.environ.get("DEBUG_SCREENSHOT_SAMPLE_RATE", "0"))
+DEBUG_SCREENSHOT_DIR = os.environ.get("DEBUG_SCREENSHOT_DIR", "screenshots")
+
+# Single background writer so saving debug screenshots never blocks a lookup
+_debug_screenshot_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="debug-screenshot")
+
+
+def _write_debug_screenshot(png_bytes, filename):
+    try:
+        os.makedirs(DEBUG_SCREENSHOT_DIR, exist_ok=True)
+        with open(os.path.join(DEBUG_SCREENSHOT_DIR, filename), "wb") as f:
+            f.write(png_bytes)
+    except Exception as e:
+        print(f"Error saving debug screenshot {filename}: {e}")
+
+def save_debug_screenshot(png_bytes, filename):
+    """Queue a sampled screenshot for asynchronous writing when debug capture is enabled."""
+    if DEBUG_SCREENSHOT_SAMPLE_RATE <= 0 or random.random() >= DEBUG_SCREENSHOT_SAMPLE_RATE:
+        return
+    _debug_screenshot_writer.submit(_write_debug_screenshot, png_bytes, filename)
+
+def decode_screenshot(screenshot):
+    """Decode a CDP screenshot payload into an in-memory PIL image."""
+    png_bytes = base64.b64decode(screenshot.get("data", ""))
+    if not png_bytes:
+        raise Exception("Screenshot capture returned no image data")
+    image = Image.open(io.BytesIO(png_bytes))
+    image.load()
+    return png_bytes, image
+
+def preprocess_for_ocr(image):
+    """Grayscale, upscale and binarize a verdict crop so Tesseract sees crisp dark-on-light text."""
+    image = image.convert("L")
+    if OCR_UPSCALE_FACTOR > 1:
+        image = image.resize(
+            (image.width * OCR_UPSCALE_FACTOR, image.height * OCR_UPSCALE_FACTOR),
+            Image.LANCZOS
+        )
+    return image.point(lambda value: 255 if value > OCR_BINARIZE_THRESHOLD else 0)
+
+def ocr_image(image, tesseract_cmd, psm=OCR_FULL_PAGE_PSM):
+    """
+    OCR an in-memory image by piping it to tesseract's stdin and reading stdout.
+    Unlike pytesseract, this never writes the image or the result to a temp file.
+    """
+    buffer = io.BytesIO()
+    image.save(buffer, format="PPM")
+    process = subprocess.run(
+        [tesseract_cmd, "stdin", "stdout", "-l", "eng", "--psm", str(psm)],
+        input=buffer.getvalue(),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        timeout=60
+    )
+    if process.returncode != 0:
+        raise Exception(f"Tesseract failed: {process.stderr.decode(errors='replace').strip()}")
+    return process.stdout.decode("utf-8", errors="replace")
+
+# Resident OCR engines: one per reserved core by default, plus a bounded backlog of waiters.
+# The affinity mask inside a container reports the host's cores, not the reservation
+OCR_POOL_SIZE = int(os.environ.get("OCR_POOL_SIZE", "0")) or max(1, int(CONTAINER_CPU))
+OCR_MAX_PENDING = int(os.environ.get("OCR_MAX_PENDING", "20"))
+OCR_ACQUIRE_TIMEOUT = float(os.environ.get("OCR_ACQUIRE_TIMEOUT", "30"))
+
+
+class OcrEnginePool:
+    """
+    Long-lived Tesseract engines shared by every request in the container.
+
+    With tesserocr installed each slot is a resident PyTessBaseAPI, so the eng
+    traineddata is loaded once per engine instead of once per image. Without it,
+    slots are plain tokens and each OCR falls back to a tesseract subprocess, still
+    bounded to `size` concurrent runs. At most `size + max_pending` OCR calls may be
+    in flight or queued; `run` admits them on the event loop, so calls beyond that
+    fail fast instead of piling up in the executor's queue.
+    """
+
+    def __init__(self, size=OCR_POOL_SIZE, max_pending=OCR_MAX_PENDING, acquire_timeout=OCR_ACQUIRE_TIMEOUT):
+        self.size = size
+        self.max_in_flight = size + max_pending
+        self.acquire_timeout = acquire_timeout
+        self.resident = False
+        self._engines = queue.Queue()
+        # One thread per admitted call, so an admitted call never waits for a thread
+        self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="ocr")
+        self._in_flight = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+        self._started = False
+
+    def start(self):
+        """Resolve the tesseract binary and language data once and load the engines."""
+        with self._lock:
+            if self._started:
+                return
+            tesseract_cmd = get_tesseract_path()
+            engines = [None] * self.size
+            if tesserocr is not None:
+                tessdata_dir = get_tessdata_dir(tesseract_cmd)
+                engines = [tesserocr.PyTessBaseAPI(path=tessdata_dir, lang="eng") for _ in range(self.size)]
+                self.resident = True
+                print(f"Loaded {self.size} resident Tesseract engines from {tessdata_dir}")
+            else:
+                print("tesserocr not installed, OCR will run one tesseract subprocess per image")
+            for engine in engines:
+                self._engines.put(engine)
+            self._started = True
+
+    def shutdown(self):
+        with self._lock:
+            while not self._engines.empty():
+                engine = self._engines.get_nowait()
+                if engine is not None:
+                    engine.End()
+            self._started = False
+            self.resident = False
+
+    async def run(self, func, *args):
+        """
+        Run `func(*args)` (decode/preprocess/OCR) on the pool's threads, or fail fast
+        with "OCR queue is full" when `max_in_flight` calls are already running or queued.
+        Must be called from the event loop; the slot is freed when the thread finishes,
+        even if the awaiting request was cancelled.
+        """
+        if self._in_flight >= self.max_in_flight:
+            self._rejected += 1
+            raise Exception("OCR queue is full")
+        loop = asyncio.get_running_loop()
+        self._in_flight += 1
+        future = self._executor.submit(func, *args)
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._finished))
+        return await asyncio.wrap_future(future)
+
+    def _finished(self):
+        self._in_flight -= 1
+
+    def image_to_string(self, image, psm=OCR_FULL_PAGE_PSM):
+        self.start()
+        try:
+            engine = self._engines.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise Exception("Timed out waiting for an OCR engine")
+        try:
+            if engine is None:
+                return ocr_image(image, get_tesseract_path(), psm=psm)
+            engine.SetPageSegMode(psm)
+            engine.SetImage(image)
+            return engine.GetUTF8Text()
+        finally:
+            if engine is not None:
+                engine.Clear()
+            self._engines.put(engine)
+
+    def metrics(self):
+        return {
+            "size": self.size,
+            "resident": self.resident,
+            "idle_engines": self._engines.qsize(),
+            "in_flight": self._in_flight,
+            "max_in_flight": self.max_in_flight,
+            "rejected": self._rejected,
+        }
+
+
+# One OCR engine pool per container, started from the Modal @enter hook
+ocr_pool = OcrEnginePool()
+
 def validate_ocr_text(text):
     """
     Validate OCR text using regex patterns and extract detection score.
@@ -255,260 +830,726 @@ def validate_ocr_text(text):
         "raw_text": text
     }
 
-def get_hash_intel(hash):
-    run_id = generate_run_id()
-    chrome_process = None
-    browser = None
-    tab = None
-    
-    try:
-        chrome_process, port = start_chrome()
-        if not chrome_process:
-            raise Exception("Failed to start Chrome")
+# Page readiness configuration
+# The fixed sleep every lookup used to pay; kept as the baseline for reporting time saved
+LEGACY_PAGE_WAIT_SECONDS = 10
+# Never wait longer than the fixed sleep did, so the worst case is no slower than before
+READINESS_HARD_TIMEOUT = min(float(os.environ.get("READINESS_HARD_TIMEOUT", str(LEGACY_PAGE_WAIT_SECONDS))),
+                             LEGACY_PAGE_WAIT_SECONDS)
+READINESS_PROBE_INTERVAL = 0.25
+
+# Per-indicator readiness profiles. `selectors` locate the detection summary widget
+# (searched through shadow roots), `network_idle_seconds` is how long the page must be
+# quiet after the load event before we give up on the verdict probe and capture anyway.
+READINESS_PROFILES = {
+    "hash": {
+        "hard_timeout": READINESS_HARD_TIMEOUT,
+        "network_idle_seconds": 1.5,
+        "max_inflight_requests": 2,
+        "selectors": ["vt-ioc-score-widget", "vt-ui-detections-widget", "#detections"],
+    },
+    "ip": {
+        "hard_timeout": READINESS_HARD_TIMEOUT,
+        "network_idle_seconds": 1.0,
+        "max_inflight_requests": 2,
+        "selectors": ["vt-ioc-score-widget", "vt-ui-detections-widget", "#detections"],
+    },
+    "domain": {
+        "hard_timeout": READINESS_HARD_TIMEOUT,
+        "network_idle_seconds": 1.0,
+        "max_inflight_requests": 2,
+        "selectors": ["vt-ioc-score-widget", "vt-ui-detections-widget", "#detections"],
+    },
+    "url": {
+        "hard_timeout": READINESS_HARD_TIMEOUT,
+        "network_idle_seconds": 1.5,
+        "max_inflight_requests": 2,
+        "selectors": ["vt-ioc-score-widget", "vt-ui-detections-widget", "#detections"],
+    },
+}
+
+# Text that only appears once VirusTotal has rendered a verdict (mirrors validate_ocr_text)
+VERDICT_TEXT_PATTERN = re.compile(
+    r'\d+\s*/\s*\d+\s+security|No\s+security\s+vendor|least\s+\d+\s+detected',
+    re.IGNORECASE
+)
 
-        pytesseract.pytesseract.tesseract_cmd = get_tesseract_path()
-        browser = pychrome.Browser(url=f"http://127.0.0.1:{port}")
-        tab = browser.new_tab()
+# Finds the first element matching any selector, searching open shadow roots, and returns
+# either its text or its page-relative bounding box depending on `want`. innerText stops at
+# a shadow host, so the text is collected through the rendered tree: shadow roots, and the
+# nodes assigned to their slots.
+DEEP_QUERY_JS = """
+(() => {
+  const selectors = %s;
+  const want = %s;
+  const deepText = (node) => {
+    if (node.nodeType === Node.TEXT_NODE) return node.textContent;
+    if (node.nodeName === "SCRIPT" || node.nodeName === "STYLE") return "";
+    let children = node.childNodes;
+    if (node.shadowRoot) {
+      children = node.shadowRoot.childNodes;
+    } else if (node.nodeName === "SLOT") {
+      const assigned = node.assignedNodes({flatten: true});
+      if (assigned.length) children = assigned;
+    }
+    return Array.from(children, deepText).join(" ");
+  };
+  const stack = [document];
+  while (stack.length) {
+    const root = stack.pop();
+    for (const selector of selectors) {
+      const el = root.querySelector(selector);
+      if (!el) continue;
+      const text = deepText(el).replace(/\\s+/g, " ").trim();
+      if (!text) continue;
+      if (want === "rect") {
+        const r = el.getBoundingClientRect();
+        if (!r.width || !r.height) continue;
+        return {x: r.left + window.scrollX, y: r.top + window.scrollY, width: r.width, height: r.height};
+      }
+      return text;
+    }
+    for (const el of root.querySelectorAll("*")) {
+      if (el.shadowRoot) stack.push(el.shadowRoot);
+    }
+  }
+  return null;
+})()
+"""
+
+
+async def _evaluate_deep_query(tab, selectors, want):
+    result = await tab.call_method(
+        "Runtime.evaluate",
+        expression=DEEP_QUERY_JS % (json.dumps(selectors), json.dumps(want)),
+        returnByValue=True,
+        _timeout=5
+    )
+    return result.get("result", {}).get("value")
 
-        tab.start()
-        tab.call_method("Page.enable")
-        tab.call_method("DOM.enable")
+async def query_deep_text(tab, selectors):
+    """Return the text of the first element matching `selectors`, piercing shadow DOM."""
+    return await _evaluate_deep_query(tab, selectors, "text")
 
-        tab.call_method("Emulation.setDeviceMetricsOverride",
-            width=1024,
-            height=1024,
-            deviceScaleFactor=1,
-            mobile=False,
-            screenOrientation={"angle": 0, "type": "portraitPrimary"}
-        )
+async def query_deep_rect(tab, selectors):
+    """Return the page-relative bounding box of the first matching element, piercing shadow DOM."""
+    return await _evaluate_deep_query(tab, selectors, "rect")
 
-        screenshot_filename = f"hash_intel_{run_id}.png"
-        screenshot_path = f"screenshots/{screenshot_filename}"
-        os.makedirs("screenshots", exist_ok=True)
+async def capture_verdict_screenshot(tab, selectors):
+    """
+    Screenshot only the detection widget when its bounding box can be located,
+    falling back to the full viewport. Returns (screenshot, region).
+    """
+    try:
+        rect = await query_deep_rect(tab, selectors)
+    except Exception as e:
+        print(f"Could not locate detection widget: {e}")
+        rect = None
+
+    if rect:
+        x = max(rect["x"] - OCR_CLIP_PADDING, 0)
+        y = max(rect["y"] - OCR_CLIP_PADDING, 0)
+        clip = {
+            "x": x,
+            "y": y,
+            "width": rect["width"] + (rect["x"] - x) + OCR_CLIP_PADDING,
+            "height": rect["height"] + (rect["y"] - y) + OCR_CLIP_PADDING,
+            "scale": 1,
+        }
+        screenshot = await tab.call_method("Page.captureScreenshot", format="png", fromSurface=True, clip=clip)
+        return screenshot, "clip"
 
-        target_url = f"https://www.virustotal.com/gui/file/{hash}/details"
-        tab.call_method("Page.navigate", url=target_url)
-        tab.wait(10)
+    screenshot = await tab.call_method("Page.captureScreenshot", format="png", fromSurface=True)
+    return screenshot, "full"
 
-        screenshot = tab.call_method("Page.captureScreenshot", format="png", fromSurface=True)
 
-        with open(screenshot_path, "wb") as f:
-            f.write(base64.b64decode(screenshot["data"]))
-            f.flush()
-            os.fsync(f.fileno())
+class PageReadiness:
+    """
+    Decides when a VirusTotal report is ready to capture from CDP events.
 
-        if not os.path.exists(screenshot_path) or os.path.getsize(screenshot_path) == 0:
-            raise Exception("Screenshot file was not properly saved")
+    `attach()` must complete before `Page.navigate` so the load event and every
+    network request of the navigation are observed. Event callbacks run on the
+    event loop, so the counters need no locking.
+    """
 
-        text = pytesseract.image_to_string(screenshot_path, lang='eng')
-       
+    def __init__(self, tab):
+        self.tab = tab
+        self._inflight = set()
+        self._last_network_activity = time.monotonic()
+        self._loaded = False
+        self.verdict_text = None
+
+    async def attach(self):
+        self.tab.set_listener("Page.loadEventFired", self._on_load)
+        self.tab.set_listener("Network.requestWillBeSent", self._on_request_started)
+        self.tab.set_listener("Network.loadingFinished", self._on_request_finished)
+        self.tab.set_listener("Network.loadingFailed", self._on_request_finished)
+        await self.tab.call_method("Network.enable")
+
+    def _on_load(self, **kwargs):
+        self._loaded = True
+
+    def _on_request_started(self, **kwargs):
+        self._inflight.add(kwargs.get("requestId"))
+        self._last_network_activity = time.monotonic()
+
+    def _on_request_finished(self, **kwargs):
+        self._inflight.discard(kwargs.get("requestId"))
+        self._last_network_activity = time.monotonic()
+
+    def _network_idle_for(self, max_inflight):
+        if len(self._inflight) > max_inflight:
+            return 0.0
+        return time.monotonic() - self._last_network_activity
+
+    async def _verdict_visible(self, selectors):
         try:
-            if os.path.exists(screenshot_path):
-                os.remove(screenshot_path)
-        except Exception as e:
-            print(f"Error cleaning up screenshot: {e}")
+            text = await query_deep_text(self.tab, selectors)
+        except Exception:
+            return False
+        if text and VERDICT_TEXT_PATTERN.search(text):
+            self.verdict_text = text
+            return True
+        return False
+
+    async def wait(self, profile):
+        """
+        Wait until the verdict is on screen, the page has gone network-idle after
+        load, or the profile's hard timeout expires. Returns a timing report.
+        """
+        started = time.monotonic()
+        deadline = started + profile["hard_timeout"]
+        reason = "timeout"
+
+        while time.monotonic() < deadline:
+            if await self._verdict_visible(profile["selectors"]):
+                reason = "verdict"
+                break
+            if (self._loaded
+                    and self._network_idle_for(profile["max_inflight_requests"]) >= profile["network_idle_seconds"]):
+                reason = "network_idle"
+                break
+            await asyncio.sleep(READINESS_PROBE_INTERVAL)
+
+        elapsed = time.monotonic() - started
+        return {
+            "ready_reason": reason,
+            "ready_seconds": round(elapsed, 2),
+            "time_saved_seconds": round(max(LEGACY_PAGE_WAIT_SECONDS - elapsed, 0.0), 2),
+        }
 
-        # Validate OCR text before returning
-        return validate_ocr_text(text)
-        
-    finally:
-        cleanup_tab_and_browser(tab, browser)
-        if chrome_process:
-            terminate_chrome(chrome_process)
 
-def get_ip_intel(ip):
-    run_id = generate_run_id()
-    chrome_process = None
-    browser = None
-    tab = None
-    
-    try:
-        chrome_process, port = start_chrome()
-        if not chrome_process:
-            raise Exception("Failed to start Chrome")
+# How often each verdict extraction path produced the result; "ocr" is the expensive fallback
+extraction_stats = {"dom": 0, "ocr": 0}
+_extraction_stats_lock = threading.Lock()
+
+
+def record_extraction(path):
+    with _extraction_stats_lock:
+        extraction_stats[path] += 1
+
+def get_extraction_stats():
+    """Snapshot of the per-path hit counters with the share of lookups that needed OCR."""
+    with _extraction_stats_lock:
+        stats = dict(extraction_stats)
+    total = stats["dom"] + stats["ocr"]
+    stats["total"] = total
+    stats["ocr_ratio"] = round(stats["ocr"] / total, 3) if total else 0.0
+    return stats
 
-        pytesseract.pytesseract.tesseract_cmd = get_tesseract_path()
-        browser = pychrome.Browser(url=f"http://127.0.0.1:{port}")
-        tab = browser.new_tab()
+def normalize_dom_text(text):
+    """Collapse the widget's multi-element innerText into the "N/NN security ..." form OCR yields."""
+    text = re.sub(r'\s+', ' ', text)
+    return re.sub(r'\s*/\s*', '/', text).strip()
 
-        tab.start()
-        tab.call_method("Page.enable")
-        tab.call_method("DOM.enable")
+async def extract_verdict_from_dom(tab, readiness, selectors):
+    """
+    Fast path: read the detection ratio straight from the DOM (piercing shadow roots).
+    Returns the validated result, or None when the page text does not yield a verdict.
+    """
+    text = readiness.verdict_text
+    if not text:
+        try:
+            text = await query_deep_text(tab, selectors)
+        except Exception as e:
+            print(f"DOM verdict extraction failed: {e}")
+            return None
+    if not text:
+        return None
+
+    result = validate_ocr_text(normalize_dom_text(text))
+    if result["status"] != "success":
+        return None
+    return result
+
+def ocr_screenshot(screenshot, region, debug_filename):
+    """Decode, optionally sample to disk, preprocess and OCR a screenshot (CPU-bound, runs off the loop)."""
+    # Decode and OCR entirely in memory; nothing touches the disk unless debug capture samples it
+    png_bytes, image = decode_screenshot(screenshot)
+    save_debug_screenshot(png_bytes, debug_filename)
+
+    ocr_started = time.monotonic()
+    if region == "clip":
+        text = ocr_pool.image_to_string(preprocess_for_ocr(image), psm=OCR_CLIP_PSM)
+    else:
+        text = ocr_pool.image_to_string(image)
+    print(f"OCR on {region} screenshot {image.size[0]}x{image.size[1]} "
+          f"took {time.monotonic() - ocr_started:.2f}s")
+    return text
+
+async def scrape_virustotal(target_url, label, viewport_height=1024):
+    """
+    Render a VirusTotal report in a pooled tab and extract the verdict, reading it
+    from the DOM when possible and falling back to screenshot + OCR.
+    """
+    run_id = generate_run_id()
 
-        tab.call_method("Emulation.setDeviceMetricsOverride",
+    async with browser_pool.tab() as tab:
+        await tab.call_method("Page.enable")
+        await tab.call_method("DOM.enable")
+
+        await tab.call_method("Emulation.setDeviceMetricsOverride",
             width=1024,
-            height=800,
+            height=viewport_height,
             deviceScaleFactor=1,
             mobile=False,
             screenOrientation={"angle": 0, "type": "portraitPrimary"}
         )
 
-        screenshot_filename = f"ip_intel_{run_id}.png"
-        screenshot_path = f"screenshots/{screenshot_filename}"
-        os.makedirs("screenshots", exist_ok=True)
+        readiness = PageReadiness(tab)
+        await readiness.attach()
+        with telemetry.span("navigate", indicator_type=label):
+            await tab.call_method("Page.navigate", url=target_url)
+        with telemetry.span("page_wait", indicator_type=label) as span:
+            timing = await readiness.wait(READINESS_PROFILES[label])
+            span.set_attribute("ready_reason", timing["ready_reason"])
+        print(f"{label} page ready after {timing['ready_seconds']}s ({timing['ready_reason']}), "
+              f"saved {timing['time_saved_seconds']}s over the fixed wait")
+
+        selectors = READINESS_PROFILES[label]["selectors"]
+        with telemetry.span("dom_extract", indicator_type=label) as span:
+            result = await extract_verdict_from_dom(tab, readiness, selectors)
+            span.set_attribute("found", bool(result))
+        if result:
+            record_extraction("dom")
+            result["source"] = "dom"
+            result.update(timing)
+            return result
+
+        with telemetry.span("screenshot", indicator_type=label) as span:
+            screenshot, region = await capture_verdict_screenshot(tab, selectors)
+            span.set_attribute("region", region)
+
+    record_extraction("ocr")
+    with telemetry.span("ocr", indicator_type=label):
+        text = await ocr_pool.run(ocr_screenshot, screenshot, region, f"{label}_intel_{run_id}.png")
+
+    # Validate OCR text before returning
+    result = validate_ocr_text(text)
+    result["source"] = "ocr"
+    result.update(timing)
+    return result
+
+async def get_hash_intel(hash):
+    target_url = f"https://www.virustotal.com/gui/file/{hash}/details"
+    return await scrape_virustotal(target_url, "hash")
+
+async def get_ip_intel(ip):
+    target_url = f"https://www.virustotal.com/gui/ip-address/{ip}/details"
+    return await scrape_virustotal(target_url, "ip", viewport_height=800)
+
+async def get_domain_intel(domain):
+    target_url = f"https://www.virustotal.com/gui/domain/{domain}/details"
+    return await scrape_virustotal(target_url, "domain")
+
+async def get_url_intel(url):
+    """Get intelligence for a URL by converting its canonical form to a SHA256 hash and querying VirusTotal."""
+    url = normalize_url(url)
+    url_hash = hashlib.sha256(url.encode()).hexdigest()
+    print(f"\n{'='*60}")
+    print(f"URL Intel Request")
+    print(f"{'='*60}")
+    print(f"Input URL: {url}")
+    print(f"SHA256 Hash: {url_hash}")
+    print(f"{'='*60}\n")
 
-        target_url = f"https://www.virustotal.com/gui/ip-address/{ip}/details"
-        tab.call_method("Page.navigate", url=target_url)
-        tab.wait(10)
-        
-        screenshot = tab.call_method("Page.captureScreenshot", format="png", fromSurface=True)
-        
-        with open(screenshot_path, "wb") as f:
-            f.write(base64.b64decode(screenshot["data"]))
-            f.flush()
-            os.fsync(f.fileno())
+    target_url = f"https://www.virustotal.com/gui/url/{url_hash}/details"
+    return await scrape_virustotal(target_url, "url")
 
-        if not os.path.exists(screenshot_path) or os.path.getsize(screenshot_path) == 0:
-            raise Exception("Screenshot file was not properly saved")
-        
-        text = pytesseract.image_to_string(screenshot_path, lang='eng')
 
-        try:
-            if os.path.exists(screenshot_path):
-                os.remove(screenshot_path)
-        except Exception as e:
-            print(f"Error cleaning up screenshot: {e}")
+# Verdict cache configuration. TTLs are per indicator type (seconds); lookups that did not
+# yield a verdict ("negative" results) expire much sooner so they are retried quickly.
+VERDICT_CACHE_TTLS = {
+    "hash": int(os.environ.get("VERDICT_CACHE_TTL_HASH", str(24 * 3600))),
+    "ip": int(os.environ.get("VERDICT_CACHE_TTL_IP", str(3600))),
+    "domain": int(os.environ.get("VERDICT_CACHE_TTL_DOMAIN", str(6 * 3600))),
+    "url": int(os.environ.get("VERDICT_CACHE_TTL_URL", str(6 * 3600))),
+}
+VERDICT_CACHE_NEGATIVE_TTL = int(os.environ.get("VERDICT_CACHE_NEGATIVE_TTL", "300"))
+VERDICT_CACHE_MAX_ENTRIES = int(os.environ.get("VERDICT_CACHE_MAX_ENTRIES", "10000"))
 
-        # Validate OCR text before returning
-        return validate_ocr_text(text)
-        
-    finally:
-        cleanup_tab_and_browser(tab, browser)
-        if chrome_process:
-            terminate_chrome(chrome_process)
+# Optional shared tier across containers: "modal" (Modal Dict), "redis" (REDIS_URL),
+# "sqlite" (VERDICT_CACHE_SQLITE_PATH) or unset for in-process only
+VERDICT_CACHE_SHARED_BACKEND = os.environ.get("VERDICT_CACHE_SHARED_BACKEND", "").lower()
+VERDICT_CACHE_MODAL_DICT = os.environ.get("VERDICT_CACHE_MODAL_DICT", "rasterize-verdict-cache")
+VERDICT_CACHE_SQLITE_PATH = os.environ.get("VERDICT_CACHE_SQLITE_PATH", "/tmp/verdict-cache.sqlite3")
 
-def get_domain_intel(domain):
-    run_id = generate_run_id()
-    chrome_process = None
-    browser = None
-    tab = None
-    
-    try:
-        chrome_process, port = start_chrome()
-        if not chrome_process:
-            raise Exception("Failed to start Chrome")
 
-        pytesseract.pytesseract.tesseract_cmd = get_tesseract_path()
-        browser = pychrome.Browser(url=f"http://127.0.0.1:{port}")
-        tab = browser.new_tab()
+# Hash types VirusTotal looks files up by
+VIRUSTOTAL_HASH_TYPES = ("md5", "sha1", "sha256")
 
-        tab.start()
-        tab.call_method("Page.enable")
-        tab.call_method("DOM.enable")
+INDICATOR_NORMALIZERS = {
+    "hash": normalize_hash,
+    "ip": normalize_ip,
+    "domain": normalize_domain,
+    "url": normalize_url,
+}
 
-        tab.call_method("Emulation.setDeviceMetricsOverride",
-            width=1024,
-            height=1024,
-            deviceScaleFactor=1,
-            mobile=False,
-            screenOrientation={"angle": 0, "type": "portraitPrimary"}
-        )
 
-        screenshot_filename = f"domain_intel_{run_id}.png"
-        screenshot_path = f"screenshots/{screenshot_filename}"
-        os.makedirs("screenshots", exist_ok=True)
+def normalize_indicator(indicator_type, value):
+    """
+    Canonical form of an indicator, used for cache keys and the VirusTotal lookup (see
+    normalization.py). Raises ValueError for a hash that is not an MD5/SHA-1/SHA-256 digest.
+    """
+    value = INDICATOR_NORMALIZERS[indicator_type](value)
+    if indicator_type == "hash" and detect_hash_type(value) not in VIRUSTOTAL_HASH_TYPES:
+        raise ValueError(f"Unsupported hash '{value}': expected an MD5, SHA-1 or SHA-256 hex digest")
+    return value
 
-        target_url = f"https://www.virustotal.com/gui/domain/{domain}/details"
-        tab.call_method("Page.navigate", url=target_url)
-        tab.wait(10)
 
-        screenshot = tab.call_method("Page.captureScreenshot", format="png", fromSurface=True)
+class LocalVerdictCache:
+    """In-process LRU of verdict entries; expired entries are dropped on read."""
 
-        with open(screenshot_path, "wb") as f:
-            f.write(base64.b64decode(screenshot["data"]))
-            f.flush()
-            os.fsync(f.fileno())
+    def __init__(self, max_entries=VERDICT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
 
-        if not os.path.exists(screenshot_path) or os.path.getsize(screenshot_path) == 0:
-            raise Exception("Screenshot file was not properly saved")
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry["expires_at"] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
 
-        text = pytesseract.image_to_string(screenshot_path, lang='eng')
-       
-        try:
-            if os.path.exists(screenshot_path):
-                os.remove(screenshot_path)
-        except Exception as e:
-            print(f"Error cleaning up screenshot: {e}")
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
 
-        # Validate OCR text before returning
-        return validate_ocr_text(text)
-        
-    finally:
-        cleanup_tab_and_browser(tab, browser)
-        if chrome_process:
-            terminate_chrome(chrome_process)
+    def __len__(self):
+        return len(self._entries)
 
-def get_url_intel(url):
-    """Get intelligence for a URL by converting it to SHA256 hash and querying VirusTotal."""
-    run_id = generate_run_id()
-    chrome_process = None
-    browser = None
-    tab = None
-    
-    # Convert URL to SHA256 hash BEFORE try block so it always prints
-    url_hash = hashlib.sha256(url.encode()).hexdigest()
-    print(f"\n{'='*60}")
-    print(f"URL Intel Request")
-    print(f"{'='*60}")
-    print(f"Input URL: {url}")
-    print(f"SHA256 Hash: {url_hash}")
-    print(f"{'='*60}\n")
-    
+
+class ModalDictVerdictCache:
+    """Shared tier backed by a named Modal Dict visible to every container of the app."""
+
+    def __init__(self, name=VERDICT_CACHE_MODAL_DICT):
+        self._dict = modal.Dict.from_name(name, create_if_missing=True)
+
+    def get(self, key):
+        return self._dict.get(key)
+
+    def set(self, key, entry):
+        self._dict[key] = entry
+
+
+class RedisVerdictCache:
+    """Shared tier backed by Redis; Redis expires the keys itself."""
+
+    def __init__(self, url=None):
+        import redis
+        self._client = redis.Redis.from_url(url or os.environ["REDIS_URL"])
+
+    def get(self, key):
+        raw = self._client.get(f"verdict:{key}")
+        return json.loads(raw) if raw else None
+
+    def set(self, key, entry):
+        ttl = max(int(entry["expires_at"] - time.time()), 1)
+        self._client.set(f"verdict:{key}", json.dumps(entry), ex=ttl)
+
+
+class SqliteVerdictCache:
+    """Shared tier stand-in for a single host: a SQLite file shared by local processes."""
+
+    def __init__(self, path=VERDICT_CACHE_SQLITE_PATH):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS verdicts (key TEXT PRIMARY KEY, entry TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT entry FROM verdicts WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, entry):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO verdicts (key, entry, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(entry), entry["expires_at"])
+            )
+            self._conn.execute("DELETE FROM verdicts WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+
+
+def create_shared_verdict_cache(backend=VERDICT_CACHE_SHARED_BACKEND):
+    """Build the configured shared tier, or None when caching stays in-process."""
+    if not backend:
+        return None
     try:
-        
-        chrome_process, port = start_chrome()
-        if not chrome_process:
-            raise Exception("Failed to start Chrome")
+        if backend == "modal":
+            return ModalDictVerdictCache()
+        if backend == "redis":
+            return RedisVerdictCache()
+        if backend == "sqlite":
+            return SqliteVerdictCache()
+        print(f"Unknown verdict cache backend '{backend}', using in-process cache only")
+    except Exception as e:
+        print(f"Failed to initialise {backend} verdict cache, using in-process cache only: {e}")
+    return None
+
+
+class VerdictCache:
+    """
+    Two-tier verdict cache keyed by (indicator type, normalized indicator).
 
-        pytesseract.pytesseract.tesseract_cmd = get_tesseract_path()
-        browser = pychrome.Browser(url=f"http://127.0.0.1:{port}")
-        tab = browser.new_tab()
+    Reads check the in-process LRU first, then the optional shared tier (whose hits
+    are copied into the LRU). Shared tier failures are logged and treated as misses.
+    """
 
-        tab.start()
-        tab.call_method("Page.enable")
-        tab.call_method("DOM.enable")
+    def __init__(self, shared=None):
+        self.local = LocalVerdictCache()
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._stats = {"local_hits": 0, "shared_hits": 0, "misses": 0, "stores": 0, "shared_errors": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, indicator_type, indicator):
+        """Return (result, age_seconds) for a live entry, or None."""
+        key = f"{indicator_type}:{indicator}"
+        entry = self.local.get(key)
+        if entry is not None:
+            self._count("local_hits")
+            return entry["result"], time.time() - entry["stored_at"]
+
+        if self.shared is not None:
+            try:
+                entry = self.shared.get(key)
+            except Exception as e:
+                print(f"Shared verdict cache read failed: {e}")
+                self._count("shared_errors")
+                entry = None
+            if entry is not None and entry["expires_at"] > time.time():
+                self.local.set(key, entry)
+                self._count("shared_hits")
+                return entry["result"], time.time() - entry["stored_at"]
+
+        self._count("misses")
+        return None
+
+    def set(self, indicator_type, indicator, result):
+        key = f"{indicator_type}:{indicator}"
+        if result.get("status") == "success":
+            ttl = VERDICT_CACHE_TTLS[indicator_type]
+        else:
+            ttl = VERDICT_CACHE_NEGATIVE_TTL
+        now = time.time()
+        entry = {
+            "result": {field: result[field] for field in ("score", "status", "source") if field in result},
+            "stored_at": now,
+            "expires_at": now + ttl,
+        }
+        self.local.set(key, entry)
+        self._count("stores")
 
-        tab.call_method("Emulation.setDeviceMetricsOverride",
-            width=1024,
-            height=1024,
-            deviceScaleFactor=1,
-            mobile=False,
-            screenOrientation={"angle": 0, "type": "portraitPrimary"}
-        )
+        if self.shared is not None:
+            try:
+                self.shared.set(key, entry)
+            except Exception as e:
+                print(f"Shared verdict cache write failed: {e}")
+                self._count("shared_errors")
+
+    async def aget(self, indicator_type, indicator):
+        """`get` for the event loop; shared tier I/O runs in a worker thread."""
+        if self.shared is None:
+            return self.get(indicator_type, indicator)
+        return await asyncio.to_thread(self.get, indicator_type, indicator)
 
-        screenshot_filename = f"url_intel_{run_id}.png"
-        screenshot_path = f"screenshots/{screenshot_filename}"
-        os.makedirs("screenshots", exist_ok=True)
+    async def aset(self, indicator_type, indicator, result):
+        """`set` for the event loop; shared tier I/O runs in a worker thread."""
+        if self.shared is None:
+            return self.set(indicator_type, indicator, result)
+        return await asyncio.to_thread(self.set, indicator_type, indicator, result)
 
-        target_url = f"https://www.virustotal.com/gui/url/{url_hash}/details"
-        tab.call_method("Page.navigate", url=target_url)
-        tab.wait(10)
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["local_hits"] + stats["shared_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["local_hits"] + stats["shared_hits"]) / lookups, 3) if lookups else 0.0
+        stats["local_entries"] = len(self.local)
+        stats["shared_backend"] = VERDICT_CACHE_SHARED_BACKEND or None
+        return stats
 
-        screenshot = tab.call_method("Page.captureScreenshot", format="png", fromSurface=True)
 
-        with open(screenshot_path, "wb") as f:
-            f.write(base64.b64decode(screenshot["data"]))
-            f.flush()
-            os.fsync(f.fileno())
+verdict_cache = VerdictCache(shared=create_shared_verdict_cache())
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one execution.
+
+    The first caller starts the coroutine as its own task; callers arriving while it
+    is in flight await the same task and receive the same result (or exception).
+    A caller being cancelled (e.g. a client disconnect) does not cancel the shared work.
+    """
 
-        if not os.path.exists(screenshot_path) or os.path.getsize(screenshot_path) == 0:
-            raise Exception("Screenshot file was not properly saved")
+    def __init__(self):
+        self._calls = {}
+        self._stats = {"executions": 0, "coalesced": 0}
+
+    async def do(self, key, fn):
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self._stats["executions"] += 1
+        else:
+            self._stats["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the outcome retrieved even if every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    def metrics(self):
+        stats = dict(self._stats)
+        stats["in_flight"] = len(self._calls)
+        requests_seen = stats["executions"] + stats["coalesced"]
+        stats["coalescing_ratio"] = round(stats["coalesced"] / requests_seen, 3) if requests_seen else 0.0
+        return stats
+
+
+# Deduplicates concurrent scrapes of the same indicator within this container
+intel_single_flight = SingleFlight()
+
+INTEL_LOOKUPS = {
+    "hash": get_hash_intel,
+    "ip": get_ip_intel,
+    "domain": get_domain_intel,
+    "url": get_url_intel,
+}
+
+
+async def get_cached_intel(indicator_type, normalized):
+    """Return the cached response for a normalized indicator, or None on a miss."""
+    cached = await verdict_cache.aget(indicator_type, normalized)
+    if cached is None:
+        return None
+    result, age = cached
+    return {**result, "cached": True, "cache_age_seconds": round(age, 1)}
+
+async def scrape_intel(indicator_type, normalized):
+    """Scrape a normalized indicator and cache the verdict, sharing the scrape with concurrent callers."""
+    async def scrape_and_store():
+        result = await INTEL_LOOKUPS[indicator_type](normalized)
+        await verdict_cache.aset(indicator_type, normalized, result)
+        return result
+
+    result = await intel_single_flight.do(f"{indicator_type}:{normalized}", scrape_and_store)
+    return {**result, "cached": False}
+
+async def lookup_intel(indicator_type, indicator):
+    """Resolve an indicator through the verdict cache, scraping VirusTotal only on a miss."""
+    with telemetry.span("intel_lookup", indicator_type=indicator_type) as span:
+        normalized = normalize_indicator(indicator_type, indicator)
+        with telemetry.span("cache_lookup", indicator_type=indicator_type):
+            cached = await get_cached_intel(indicator_type, normalized)
+        span.set_attribute("cached", cached is not None)
+        if cached is not None:
+            return cached
+        return await scrape_intel(indicator_type, normalized)
+
+
+# Batch lookups: maximum indicators per request and how many cache misses one batch
+# scrapes at once (the browser pool still bounds total tabs across all requests)
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", "500"))
+BATCH_MAX_PARALLEL = int(os.environ.get("BATCH_MAX_PARALLEL", str(BROWSER_TABS_PER_BROWSER)))
+
+
+async def iter_batch_intel(items, max_parallel=BATCH_MAX_PARALLEL):
+    """
+    Resolve a mixed list of {"type", "value"} items, yielding one result dict per unique
+    normalized indicator as soon as it is available. Cache hits are yielded first, misses
+    are scraped with bounded parallelism. Item failures are reported in their own result.
+    """
+    unique = OrderedDict()
+    for index, item in enumerate(items):
+        indicator_type = item["type"].strip().lower()
+        value = item["value"]
+        if indicator_type not in INTEL_LOOKUPS:
+            yield {"type": indicator_type, "value": value, "indices": [index], "success": False,
+                   "error": f"Unsupported indicator type '{indicator_type}'"}
+            continue
+        try:
+            key = (indicator_type, normalize_indicator(indicator_type, value))
+        except ValueError as e:
+            yield {"type": indicator_type, "value": value, "indices": [index], "success": False, "error": str(e)}
+            continue
+        if key in unique:
+            unique[key]["indices"].append(index)
+        else:
+            unique[key] = {"type": indicator_type, "value": key[1], "indices": [index]}
 
-        text = pytesseract.image_to_string(screenshot_path, lang='eng')
-       
+    misses = []
+    for (indicator_type, normalized), entry in unique.items():
         try:
-            if os.path.exists(screenshot_path):
-                os.remove(screenshot_path)
+            cached = await get_cached_intel(indicator_type, normalized)
         except Exception as e:
-            print(f"Error cleaning up screenshot: {e}")
+            yield {**entry, "success": False, "error": str(e)}
+            continue
+        if cached is not None:
+            yield {**entry, "success": True, **cached}
+        else:
+            misses.append(entry)
 
-        # Validate OCR text before returning
-        return validate_ocr_text(text)
-        
+    if not misses:
+        return
+
+    semaphore = asyncio.Semaphore(max(1, max_parallel))
+
+    async def resolve(entry):
+        async with semaphore:
+            try:
+                return {**entry, "success": True, **await scrape_intel(entry["type"], entry["value"])}
+            except Exception as e:
+                return {**entry, "success": False, "error": str(e)}
+
+    tasks = [asyncio.create_task(resolve(entry)) for entry in misses]
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            yield await next_result
     finally:
-        cleanup_tab_and_browser(tab, browser)
-        if chrome_process:
-            terminate_chrome(chrome_process)
+        # Stop waiting scrapes if the client goes away mid-stream (shared single-flight work continues)
+        for task in tasks:
+            task.cancel()
 
 
 # Authentication helper
@@ -543,111 +1584,205 @@ def verify_api_key(request):
 
 
 # Create the FastAPI web endpoint
-@app.function(
+@app.cls(
     image=image,
     timeout=300,
     secrets=[modal.Secret.from_name("rasterize-auth")],
+    cpu=CONTAINER_CPU,
     max_containers=10
 )
-@modal.asgi_app()
-@modal.concurrent(max_inputs=10)
-def fastapi_app():
-    from fastapi import FastAPI, Request
-    from pydantic import BaseModel
-    
-    # Define Pydantic models inside the function
-    class HashIntelRequestModel(BaseModel):
-        hash: str
-
-    class IPIntelRequestModel(BaseModel):
-        ip: str
-
-    class DomainIntelRequestModel(BaseModel):
-        domain: str
-
-    class URLIntelRequestModel(BaseModel):
-        url: str
-
-    class IntelResponseModel(BaseModel):
-        success: bool
-        score: Optional[str] = None
-        status: Optional[str] = None
-        data: Optional[str] = None
-        error: Optional[str] = None
-    
-    web_app = FastAPI(
-        title="Rasterize Intelligence API",
-        description="API for gathering intelligence from VirusTotal via web scraping and OCR",
-        version="1.0.0"
-    )
+# Requests spend their time awaiting CDP events and OCR threads, so one event loop can hold
+# many more in flight than the browser pool has tabs; the pool queues the rest. The autoscaler
+# aims for one request per tab and only packs up to max_inputs during bursts
+@modal.concurrent(max_inputs=100, target_inputs=BROWSER_POOL_SIZE * BROWSER_TABS_PER_BROWSER)
+class RasterizeService:
+    @modal.enter()
+    def start_ocr_pool(self):
+        """Load the resident OCR engines before the first request arrives."""
+        ocr_pool.start()
+
+    @modal.exit()
+    def stop_ocr_pool(self):
+        ocr_pool.shutdown()
+
+    # Keep the label of the former function-based endpoint so the public URL does not change
+    @modal.asgi_app(label="rasterize-fastapi-app")
+    def fastapi_app(self):
+        from fastapi import FastAPI, HTTPException, Request
+        from fastapi.responses import PlainTextResponse, StreamingResponse
+        from pydantic import BaseModel
     
-    @web_app.get("/")
-    def root():
-        return {
-            "message": "Rasterize Intelligence API",
-            "endpoints": {
-                "/hash": "POST - Get intelligence for a file hash",
-                "/ip": "POST - Get intelligence for an IP address",
-                "/domain": "POST - Get intelligence for a domain",
-                "/url": "POST - Get intelligence for a URL (converted to SHA256)"
-            },
-            "authentication": "Required - Use 'Authorization: Bearer <api_key>' header"
-        }
-    
-    @web_app.post("/hash", response_model=IntelResponseModel)
-    def hash_intel_endpoint(request_body: HashIntelRequestModel, request: Request):
-        """Get intelligence for a file hash from VirusTotal."""
-        verify_api_key(request)
-        try:
-            result = get_hash_intel(request_body.hash)
+        # Define Pydantic models inside the function
+        class HashIntelRequestModel(BaseModel):
+            hash: str
+
+        class IPIntelRequestModel(BaseModel):
+            ip: str
+
+        class DomainIntelRequestModel(BaseModel):
+            domain: str
+
+        class URLIntelRequestModel(BaseModel):
+            url: str
+
+        class BatchIndicatorModel(BaseModel):
+            type: str
+            value: str
+
+        class BatchIntelRequestModel(BaseModel):
+            indicators: List[BatchIndicatorModel]
+
+        class IntelResponseModel(BaseModel):
+            success: bool
+            score: Optional[str] = None
+            status: Optional[str] = None
+            data: Optional[str] = None
+            error: Optional[str] = None
+            ready_reason: Optional[str] = None
+            ready_seconds: Optional[float] = None
+            time_saved_seconds: Optional[float] = None
+            cached: Optional[bool] = None
+            cache_age_seconds: Optional[float] = None
+
+        def intel_response(result):
             return IntelResponseModel(
                 success=True,
                 score=result["score"],
-                status=result["status"]
+                status=result["status"],
+                ready_reason=result.get("ready_reason"),
+                ready_seconds=result.get("ready_seconds"),
+                time_saved_seconds=result.get("time_saved_seconds"),
+                cached=result.get("cached"),
+                cache_age_seconds=result.get("cache_age_seconds")
             )
-        except Exception as e:
-            return IntelResponseModel(success=False, score="0", status="error", error=str(e))
     
-    @web_app.post("/ip", response_model=IntelResponseModel)
-    def ip_intel_endpoint(request_body: IPIntelRequestModel, request: Request):
-        """Get intelligence for an IP address from VirusTotal."""
-        verify_api_key(request)
-        try:
-            result = get_ip_intel(request_body.ip)
-            return IntelResponseModel(
-                success=True,
-                score=result["score"],
-                status=result["status"]
-            )
-        except Exception as e:
-            return IntelResponseModel(success=False, score="0", status="error", error=str(e))
+        @asynccontextmanager
+        async def lifespan(app):
+            # The browser pool's CDP connections belong to the event loop serving requests,
+            # so it is warmed here rather than in the Modal @enter hook
+            await browser_pool.start()
+            yield
+            await browser_pool.shutdown()
+
+        web_app = FastAPI(
+            title="Rasterize Intelligence API",
+            description="API for gathering intelligence from VirusTotal via web scraping and OCR",
+            version="1.0.0",
+            lifespan=lifespan
+        )
+
+        @web_app.middleware("http")
+        async def time_requests(request: Request, call_next):
+            started = time.perf_counter()
+            status = 500
+            try:
+                response = await call_next(request)
+                status = response.status_code
+                return response
+            finally:
+                # The route template keeps the label set bounded
+                route = request.scope.get("route")
+                path = getattr(route, "path", None) or "unmatched"
+                http_request_seconds.observe(
+                    time.perf_counter() - started, method=request.method, path=path, status=status
+                )
     
-    @web_app.post("/domain", response_model=IntelResponseModel)
-    def domain_intel_endpoint(request_body: DomainIntelRequestModel, request: Request):
-        """Get intelligence for a domain from VirusTotal."""
-        verify_api_key(request)
-        try:
-            result = get_domain_intel(request_body.domain)
-            return IntelResponseModel(
-                success=True,
-                score=result["score"],
-                status=result["status"]
-            )
-        except Exception as e:
-            return IntelResponseModel(success=False, score="0", status="error", error=str(e))
+        @web_app.get("/")
+        def root():
+            return {
+                "message": "Rasterize Intelligence API",
+                "endpoints": {
+                    "/hash": "POST - Get intelligence for a file hash",
+                    "/ip": "POST - Get intelligence for an IP address",
+                    "/domain": "POST - Get intelligence for a domain",
+                    "/url": "POST - Get intelligence for a URL (converted to SHA256)",
+                    "/batch": "POST - Get intelligence for a mixed list of indicators (streams NDJSON)",
+                    "/pool": "GET - Browser pool size and occupancy",
+                    "/extraction": "GET - How often verdicts came from the DOM fast path vs OCR",
+                    "/cache": "GET - Verdict cache and request coalescing statistics",
+                    "/metrics": "GET - Per-stage and request latency histograms (Prometheus text format)"
+                },
+                "authentication": "Required - Use 'Authorization: Bearer <api_key>' header"
+            }
     
-    @web_app.post("/url", response_model=IntelResponseModel)
-    def url_intel_endpoint(request_body: URLIntelRequestModel, request: Request):
-        """Get intelligence for a URL from VirusTotal (URL is converted to SHA256)."""
-        verify_api_key(request)
-        try:
-            result = get_url_intel(request_body.url)
-            return IntelResponseModel(
-                success=True,
-                score=result["score"],
-                status=result["status"]
-            )
-        except Exception as e:
-            return IntelResponseModel(success=False, score="0", status="error", error=str(e))
+        @web_app.post("/hash", response_model=IntelResponseModel)
+        async def hash_intel_endpoint(request_body: HashIntelRequestModel, request: Request):
+            """Get intelligence for a file hash from VirusTotal."""
+            verify_api_key(request)
+            try:
+                return intel_response(await lookup_intel("hash", request_body.hash))
+            except Exception as e:
+                return IntelResponseModel(success=False, score="0", status="error", error=str(e))
+    
+        @web_app.post("/ip", response_model=IntelResponseModel)
+        async def ip_intel_endpoint(request_body: IPIntelRequestModel, request: Request):
+            """Get intelligence for an IP address from VirusTotal."""
+            verify_api_key(request)
+            try:
+                return intel_response(await lookup_intel("ip", request_body.ip))
+            except Exception as e:
+                return IntelResponseModel(success=False, score="0", status="error", error=str(e))
+    
+        @web_app.post("/domain", response_model=IntelResponseModel)
+        async def domain_intel_endpoint(request_body: DomainIntelRequestModel, request: Request):
+            """Get intelligence for a domain from VirusTotal."""
+            verify_api_key(request)
+            try:
+                return intel_response(await lookup_intel("domain", request_body.domain))
+            except Exception as e:
+                return IntelResponseModel(success=False, score="0", status="error", error=str(e))
+    
+        @web_app.post("/url", response_model=IntelResponseModel)
+        async def url_intel_endpoint(request_body: URLIntelRequestModel, request: Request):
+            """Get intelligence for a URL from VirusTotal (URL is converted to SHA256)."""
+            verify_api_key(request)
+            try:
+                return intel_response(await lookup_intel("url", request_body.url))
+            except Exception as e:
+                return IntelResponseModel(success=False, score="0", status="error", error=str(e))
     
-    return web_app
\ No newline at end of file
+        @web_app.post("/batch")
+        async def batch_intel_endpoint(request_body: BatchIntelRequestModel, request: Request):
+            """
+            Get intelligence for many hashes/IPs/domains/URLs in one call. Results are
+            streamed as NDJSON, one line per unique indicator, in completion order;
+            `indices` maps each line back to the positions in the request.
+            """
+            verify_api_key(request)
+            if len(request_body.indicators) > BATCH_MAX_ITEMS:
+                raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_ITEMS} indicators")
+
+            items = [indicator.model_dump() for indicator in request_body.indicators]
+
+            async def ndjson_lines():
+                async for result in iter_batch_intel(items):
+                    result.pop("raw_text", None)
+                    yield json.dumps(result) + "\n"
+
+            return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+        @web_app.get("/pool")
+        async def pool_metrics(request: Request):
+            """Browser pool size and occupancy metrics for this container."""
+            verify_api_key(request)
+            return browser_pool.metrics()
+
+        @web_app.get("/extraction")
+        async def extraction_metrics(request: Request):
+            """Per-path verdict extraction counters (DOM fast path vs screenshot OCR)."""
+            verify_api_key(request)
+            return get_extraction_stats()
+
+        @web_app.get("/cache")
+        async def cache_metrics(request: Request):
+            """Verdict cache hit/miss and request coalescing statistics for this container."""
+            verify_api_key(request)
+            return {**verdict_cache.metrics(), "coalescing": intel_single_flight.metrics()}
+
+        @web_app.get("/metrics")
+        async def prometheus_metrics(request: Request):
+            """Stage and request latency histograms for this container, in the Prometheus text format."""
+            verify_api_key(request)
+            return PlainTextResponse(telemetry.render(), media_type="text/plain; version=0.0.4")
+
+        return web_app
\ No newline at end of file